@@ -0,0 +1,173 @@
+import re
+import uuid
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+
+
+def _terms(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class _Data:
+    def __init__(self, collection: "FakeCollection"):
+        self._collection = collection
+
+    async def insert_many(self, objects) -> SimpleNamespace:
+        await self._collection.client.delay("insert")
+        for obj in objects:
+            properties = getattr(obj, "properties", obj)
+            object_id = str(getattr(obj, "uuid", None) or uuid.uuid4())
+            self._collection.objects[object_id] = dict(properties)
+            vector = getattr(obj, "vector", None)
+            if vector is not None:
+                self._collection.vectors[object_id] = [float(value) for value in vector]
+            # Term counts are computed once here so searches stay cheap
+            self._collection.term_counts[object_id] = Counter(_terms(properties.get("content", "")))
+        return SimpleNamespace(errors={}, uuids={i: None for i in range(len(objects))})
+
+    async def exists(self, object_id) -> bool:
+        await self._collection.client.delay("query")
+        return str(object_id) in self._collection.objects
+
+
+class _Query:
+    def __init__(self, collection: "FakeCollection"):
+        self._collection = collection
+
+    def _hit(
+        self, object_id: str, properties: Dict[str, Any], return_properties, score=None, include_vector=False
+    ) -> SimpleNamespace:
+        if return_properties is not None:
+            properties = {k: v for k, v in properties.items() if k in return_properties}
+        vector = self._collection.vectors.get(object_id) if include_vector else None
+        return SimpleNamespace(
+            uuid=object_id,
+            properties=properties,
+            metadata=SimpleNamespace(score=score, distance=None),
+            vector={"default": vector} if vector is not None else {}
+        )
+
+    async def bm25(
+        self, query: str, limit: int = 5, return_properties=None, offset=None, **kwargs
+    ) -> SimpleNamespace:
+        """Rank by plain query-term frequency; good enough to exercise the API paths."""
+        await self._collection.client.delay("query")
+        terms = set(_terms(query))
+        scored = []
+        for object_id, counts in self._collection.term_counts.items():
+            score = sum(counts[term] for term in terms if term in counts)
+            if score:
+                scored.append((score, object_id, self._collection.objects[object_id]))
+        scored.sort(key=lambda hit: -hit[0])
+        return SimpleNamespace(objects=[
+            self._hit(object_id, properties, return_properties, float(score))
+            for score, object_id, properties in scored[offset or 0:(offset or 0) + limit]
+        ])
+
+    async def hybrid(
+        self, query: str, limit: int = 5, return_properties=None, offset=None, **kwargs
+    ) -> SimpleNamespace:
+        return await self.bm25(query, limit=limit, return_properties=return_properties, offset=offset)
+
+    async def fetch_objects(
+        self, limit: int = 5, return_properties=None, offset=None, after=None, include_vector=False, **kwargs
+    ) -> SimpleNamespace:
+        await self._collection.client.delay("query")
+        # Objects come back in id order, which is what Weaviate's after= cursor pages through
+        items = sorted(item for item in self._collection.objects.items() if after is None or item[0] > str(after))
+        items = items[offset or 0:(offset or 0) + limit]
+        return SimpleNamespace(objects=[
+            self._hit(object_id, properties, return_properties, include_vector=include_vector)
+            for object_id, properties in items
+        ])
+
+
+class _Config:
+    def __init__(self, collection: "FakeCollection"):
+        self._collection = collection
+
+    async def get(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            name=self._collection.name,
+            vectorizer="text2vec-transformers",
+            properties=[
+                SimpleNamespace(name=name, data_type=data_type) for name, data_type in self._collection.properties
+            ]
+        )
+
+    async def add_property(self, prop) -> None:
+        self._collection.properties.append((prop.name, prop.dataType))
+
+    async def update_vectorizer(self, **kwargs) -> None:
+        pass
+
+
+class FakeCollection:
+    def __init__(self, client: "FakeWeaviateClient", name: str, properties: List[Tuple[str, Any]]):
+        self.client = client
+        self.name = name
+        self.properties = properties
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.vectors: Dict[str, List[float]] = {}
+        self.term_counts: Dict[str, Counter] = {}
+        self.data = _Data(self)
+        self.query = _Query(self)
+        self.config = _Config(self)
+
+
+class _Collections:
+    def __init__(self, client: "FakeWeaviateClient"):
+        self._client = client
+        self._collections: Dict[str, FakeCollection] = {}
+
+    async def list_all(self) -> Dict[str, SimpleNamespace]:
+        await self._client.delay("schema")
+        return {name: SimpleNamespace(name=name) for name in self._collections}
+
+    async def exists(self, name: str) -> bool:
+        await self._client.delay("schema")
+        return name in self._collections
+
+    def get(self, name: str) -> FakeCollection:
+        return self._collections[name]
+
+    async def create(self, name: str, properties=None, **kwargs) -> FakeCollection:
+        await self._client.delay("schema")
+        if name in self._collections:
+            raise Exception(f"class name {name!r} already exists")
+        self._collections[name] = FakeCollection(self._client, name, [(p.name, p.dataType) for p in properties or []])
+        return self._collections[name]
+
+
+class FakeWeaviateClient:
+    """In-process stand-in for the async Weaviate v4 client surface used by main.py.
+
+    Objects are kept in dicts and searched by term frequency. latency maps an
+    operation kind ("query", "insert", "schema") to a simulated round trip in
+    seconds, so benchmarks can model a remote cluster without one.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None):
+        self.latency = latency or {}
+        self.collections = _Collections(self)
+
+    async def delay(self, kind: str) -> None:
+        seconds = self.latency.get(kind, 0.0)
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def is_ready(self) -> bool:
+        return True
+
+    async def get_meta(self) -> Dict[str, Any]:
+        return {"version": "fake", "modules": {}}
@@ -0,0 +1,87 @@
+"""OpenAI-compatible stand-in for the DeepSeek chat completions API.
+
+Runs in-process for the benchmarks, or standalone for manual testing:
+
+    MOCK_DEEPSEEK_LATENCY_MS=200 uvicorn bench.mock_deepseek:app --port 9100
+    DEEPSEEK_API_BASE=http://localhost:9100/v1 DEEPSEEK_API_KEY=test uvicorn main:app
+"""
+import os
+import json
+import time
+import random
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated upstream timings (milliseconds)
+MOCK_DEEPSEEK_LATENCY_MS = float(os.getenv("MOCK_DEEPSEEK_LATENCY_MS", "50"))
+MOCK_DEEPSEEK_JITTER_MS = float(os.getenv("MOCK_DEEPSEEK_JITTER_MS", "10"))
+MOCK_DEEPSEEK_TOKEN_MS = float(os.getenv("MOCK_DEEPSEEK_TOKEN_MS", "5"))
+MOCK_DEEPSEEK_TOKENS = int(os.getenv("MOCK_DEEPSEEK_TOKENS", "40"))
+
+
+def create_app(
+    latency_ms: float = MOCK_DEEPSEEK_LATENCY_MS,
+    jitter_ms: float = MOCK_DEEPSEEK_JITTER_MS,
+    token_ms: float = MOCK_DEEPSEEK_TOKEN_MS,
+    tokens: int = MOCK_DEEPSEEK_TOKENS,
+    seed: int = 0,
+) -> FastAPI:
+    """Build a mock server whose answers take latency_ms (+/- jitter_ms) to start.
+
+    Streaming answers then emit one token every token_ms. The jitter comes
+    from a seeded generator so repeated runs see the same delays.
+    """
+    mock = FastAPI()
+    rng = random.Random(seed)
+
+    def first_byte_delay() -> float:
+        return max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    @mock.post("/v1/chat/completions")
+    @mock.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "deepseek-chat")
+        words = [f"token{i}" for i in range(tokens)]
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        completion_id = f"mock-{time.time_ns()}"
+        await asyncio.sleep(first_byte_delay())
+
+        if body.get("stream"):
+            async def events():
+                for word in words:
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if token_ms:
+                        await asyncio.sleep(token_ms / 1000)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": tokens,
+                "total_tokens": prompt_tokens + tokens
+            }
+        })
+
+    return mock
+
+
+app = create_app()
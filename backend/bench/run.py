@@ -0,0 +1,327 @@
+"""Benchmark /upload, /search and /chat against in-process fakes.
+
+The FastAPI app runs in this process with FakeWeaviateClient in place of the
+Weaviate cluster (or the in-memory store with --store memory) and the mock
+DeepSeek server behind its HTTP client, so runs need no network and are
+repeatable. Run from backend/:
+
+    python -m bench.run --concurrency 1,8,32 --requests 200
+    python -m bench.run --store memory
+    python -m bench.run --compare bench/results/baseline.json --max-regression 20
+
+Each scenario is driven at each concurrency level and reports p50/p95/p99
+latency and requests per second. Results are written as JSON.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import asyncio
+import platform
+import datetime
+import itertools
+import subprocess
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.fake_weaviate import FakeWeaviateClient
+from bench.mock_deepseek import create_app as create_mock_deepseek
+
+SCENARIOS = ("upload", "search", "chat")
+
+VOCABULARY = (
+    "refund policy shipping invoice customer account password reset warranty delivery order "
+    "payment subscription cancel upgrade support ticket billing address tracking return "
+    "exchange discount coupon loyalty points privacy security login device update release"
+).split()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def make_document(rng: random.Random, words: int) -> str:
+    sentences = []
+    for _ in range(max(1, words // 12)):
+        sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(12)).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def make_queries(rng: random.Random, count: int) -> List[str]:
+    return [" ".join(rng.sample(VOCABULARY, 3)) for _ in range(count)]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def start_app(args) -> Tuple[Any, FakeWeaviateClient]:
+    """Import main with the fakes wired in and run its startup hook."""
+    # Keep job state out of the working tree and log noise out of the timings
+    work_dir = tempfile.mkdtemp(prefix="weavdemo-bench-")
+    os.environ.setdefault("INGEST_QUEUE_PATH", os.path.join(work_dir, "ingest_queue.sqlite3"))
+    os.environ.setdefault("INGEST_SPOOL_DIR", os.path.join(work_dir, "ingest_spool"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["VECTOR_STORE"] = args.store
+    os.environ.setdefault("MEMORY_STORE_PATH", os.path.join(work_dir, "vector_store"))
+    os.environ.setdefault("BM25_INDEX_PATH", os.path.join(work_dir, "bm25_index"))
+
+    import main
+    import weaviate
+
+    fake_client = FakeWeaviateClient(latency={
+        "query": args.weaviate_latency_ms / 1000,
+        "insert": args.weaviate_latency_ms / 1000,
+        "schema": args.weaviate_latency_ms / 1000,
+    })
+    mock_deepseek = create_mock_deepseek(
+        latency_ms=args.deepseek_latency_ms, jitter_ms=args.deepseek_jitter_ms, seed=args.seed
+    )
+    weaviate.use_async_with_weaviate_cloud = lambda **kwargs: fake_client
+    main.create_http_client = lambda: httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=mock_deepseek), base_url="http://mock-deepseek/v1"
+    )
+    main.DEEPSEEK_API_KEY = main.DEEPSEEK_API_KEY or "bench"
+    await main.startup_event()
+    return main, fake_client
+
+
+async def run_level(
+    http: httpx.AsyncClient, make_request: Callable[[int], Dict[str, Any]], concurrency: int, total: int
+) -> Dict[str, Any]:
+    """Send total requests from concurrency workers and summarise their latencies."""
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            request = make_request(index)
+            started = time.perf_counter()
+            try:
+                response = await http.request(**request)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    as_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": as_ms(percentile(latencies, 0.50)),
+            "p95": as_ms(percentile(latencies, 0.95)),
+            "p99": as_ms(percentile(latencies, 0.99)),
+            "mean": as_ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "max": as_ms(latencies[-1]) if latencies else 0.0
+        }
+    }
+
+
+def scenario_requests(name: str, args, rng: random.Random, queries: List[str]) -> Callable[[int], Dict[str, Any]]:
+    if name == "upload":
+        run_tag = rng.getrandbits(32)
+
+        def make_request(index: int) -> Dict[str, Any]:
+            # Unique content per request, otherwise deduplication short-circuits the upload
+            text = f"bench {run_tag} {index}\n" + make_document(random.Random(index), args.doc_words)
+            return {
+                "method": "POST",
+                "url": "/upload",
+                "params": {"wait": "true"},
+                "files": [("files", (f"bench-{index}.txt", text.encode(), "text/plain"))]
+            }
+        return make_request
+
+    if name == "search":
+        return lambda index: {
+            "method": "POST",
+            "url": "/search",
+            "json": {"query": queries[index % len(queries)], "limit": 5, "cache": args.search_cache}
+        }
+
+    if name == "chat":
+        return lambda index: {
+            "method": "POST",
+            "url": "/chat",
+            "json": {"messages": [{"role": "user", "content": queries[index % len(queries)]}]}
+        }
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def seed_corpus(http: httpx.AsyncClient, rng: random.Random, documents: int, words: int) -> None:
+    for start in range(0, documents, 10):
+        files = [
+            ("files", (f"corpus-{i}.txt", make_document(rng, words).encode(), "text/plain"))
+            for i in range(start, min(start + 10, documents))
+        ]
+        response = await http.post("/upload", params={"wait": "true"}, files=files)
+        response.raise_for_status()
+
+
+async def run(args) -> Dict[str, Any]:
+    main, fake_client = await start_app(args)
+    rng = random.Random(args.seed)
+    queries = make_queries(rng, 50)
+    results = []
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120
+        ) as http:
+            await seed_corpus(http, rng, args.corpus_docs, args.doc_words)
+            for name in args.scenarios:
+                make_request = scenario_requests(name, args, rng, queries)
+                for concurrency in args.concurrency:
+                    if args.warmup:
+                        await run_level(http, make_request, concurrency, args.warmup)
+                    level = await run_level(http, make_request, concurrency, args.requests)
+                    level["scenario"] = name
+                    results.append(level)
+                    print(
+                        f"{name:<7} c={concurrency:<4} rps={level['rps']:<9} "
+                        f"p50={level['latency_ms']['p50']}ms p95={level['latency_ms']['p95']}ms "
+                        f"p99={level['latency_ms']['p99']}ms errors={level['errors']}"
+                    )
+        if args.store == "memory":
+            objects_stored = (await main.store.meta())["collections"].get("Document", 0)
+        else:
+            objects_stored = len(fake_client.collections._collections["Document"].objects)
+    finally:
+        await main.shutdown_event()
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "objects_stored": objects_stored,
+            "config": {
+                "scenarios": args.scenarios,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "seed": args.seed,
+                "corpus_docs": args.corpus_docs,
+                "doc_words": args.doc_words,
+                "search_cache": args.search_cache,
+                "store": args.store,
+                "weaviate_latency_ms": args.weaviate_latency_ms,
+                "deepseek_latency_ms": args.deepseek_latency_ms,
+                "deepseek_jitter_ms": args.deepseek_jitter_ms
+            }
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: Optional[float]) -> bool:
+    """Print p95 and throughput changes against a baseline run; False if p95 regressed too far."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    ok = True
+    print(f"\nCompared with {baseline['meta'].get('git_commit')} ({baseline['meta'].get('timestamp')}):")
+    for result in current["results"]:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        p95_change = _change(before["latency_ms"]["p95"], result["latency_ms"]["p95"])
+        rps_change = _change(before["rps"], result["rps"])
+        flag = ""
+        if max_regression is not None and p95_change is not None and p95_change > max_regression:
+            flag = "  REGRESSION"
+            ok = False
+        print(
+            f"{result['scenario']:<7} c={result['concurrency']:<4} "
+            f"p95 {before['latency_ms']['p95']} -> {result['latency_ms']['p95']}ms ({_signed(p95_change)}), "
+            f"rps {before['rps']} -> {result['rps']} ({_signed(rps_change)}){flag}"
+        )
+    return ok
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _signed(change: Optional[float]) -> str:
+    return "n/a" if change is None else f"{change:+.1f}%"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [name.strip() for name in value.split(",") if name.strip()])
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda value: [int(level) for level in value.split(",")])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each level")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus-docs", type=int, default=100, help="Documents uploaded before measuring")
+    parser.add_argument("--doc-words", type=int, default=600)
+    parser.add_argument("--store", choices=("weaviate", "memory"), default="weaviate",
+                        help="Fake Weaviate client or the in-process memory store")
+    parser.add_argument("--search-cache", action="store_true", help="Let /search serve from the result cache")
+    parser.add_argument("--weaviate-latency-ms", type=float, default=5.0)
+    parser.add_argument("--deepseek-latency-ms", type=float, default=50.0)
+    parser.add_argument("--deepseek-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--output", help="Result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="Exit with status 1 if any p95 is this many percent above the baseline")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as result_file:
+        json.dump(report, result_file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            if not compare(report, json.load(baseline_file), args.max_regression):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
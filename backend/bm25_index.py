@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import math
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+from structured_logging import get_logger
+from vector_store import SearchHit
+
+# Local keyword index settings
+BM25_INDEX_ENABLED = os.getenv("BM25_INDEX_ENABLED", "true").lower() == "true"
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "bm25_index")
+BM25_SNAPSHOT_EVERY = int(os.getenv("BM25_SNAPSHOT_EVERY", "10000"))
+
+logger = get_logger("bm25_index")
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Indices of the limit highest scores, best first, without sorting everything.
+
+    Ties are broken by index, exactly as a stable full sort would, so
+    top_k(scores, n)[offset:] pages through results consistently.
+    """
+    if limit <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if scores.size > limit:
+        threshold = np.partition(scores, scores.size - limit)[scores.size - limit]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:limit - above.size]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class BM25Index:
+    """Incremental inverted index with Okapi BM25 scoring.
+
+    Each term's postings are two array('I') buffers (document numbers and term
+    frequencies), so memory stays close to 8 bytes per posting and scoring a
+    term is a vectorized NumPy pass over zero-copy views of them. Re-adding an
+    id tombstones its previous document.
+
+    With a path, documents are appended to docs.jsonl as they are added and
+    search() reads hit properties back from it by offset. The postings are
+    snapshotted every BM25_SNAPSHOT_EVERY documents (and on close), and on
+    load only the log written after the last snapshot is re-tokenized.
+
+    Several processes (e.g. server workers) can share one path: appends are
+    serialized with an flock, and each process indexes the log in file order
+    by tailing it, so they all assign the same document numbers and any of
+    them can write the snapshot.
+    """
+
+    def __init__(self, path: Optional[str] = BM25_INDEX_PATH, field: str = "content", k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.field = field
+        self.k1 = k1
+        self.b = b
+        self._log = None
+        self._reader = None
+        self._position = 0  # End of the last log record indexed
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vocabulary: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._log_offsets = array("Q")
+        self._deleted = bytearray()
+        self._live = 0
+        self._total_length = 0
+        self._unsaved = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self) -> None:
+        """Open the on-disk index, restoring the snapshot and replaying newer log entries."""
+        if self.path is None or self._log is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        log_start = self._load_snapshot()
+        self._log = open(self._file("docs.jsonl"), "ab")
+        with self._locked():
+            if log_start > os.path.getsize(self._file("docs.jsonl")):
+                # The log no longer matches the snapshot, so rebuild from the log alone
+                self._reset()
+                log_start = 0
+            self._reader = open(self._file("docs.jsonl"), "rb")
+            self._position = log_start
+            # No writer holds the lock, so a torn final record is left over from a crash: drop it
+            replayed = self._catch_up(truncate_torn=True)
+        self._unsaved = replayed
+        logger.info(f"BM25 index loaded with {self._live} documents ({replayed} replayed from the log)")
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._log.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self, truncate_torn: bool = False) -> int:
+        """Index log records appended since the last call, by this or another process."""
+        if os.fstat(self._reader.fileno()).st_size <= self._position:
+            return 0
+        self._reader.seek(self._position)
+        indexed = 0
+        while True:
+            line = self._reader.readline()
+            if not line.endswith(b"\n"):
+                # Either torn or still being written by another process
+                if line and truncate_torn:
+                    os.truncate(self._file("docs.jsonl"), self._position)
+                break
+            record = json.loads(line)
+            self._index(record["id"], record["properties"], self._position)
+            self._position += len(line)
+            indexed += 1
+        return indexed
+
+    def refresh(self) -> None:
+        """Pick up documents other processes have added to a shared path."""
+        if self._reader is not None:
+            self._unsaved += self._catch_up()
+
+    def _load_snapshot(self) -> int:
+        try:
+            arrays = np.load(self._file("snapshot.npz"))
+            meta = json.loads(arrays["meta"].tobytes())
+        except (OSError, ValueError, KeyError):
+            return 0
+        self._vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+        self._doc_ids = meta["doc_ids"]
+        offsets, docs, tfs = arrays["offsets"], arrays["docs"], arrays["tfs"]
+        self._postings_docs = [array("I", docs[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(offsets) - 1)]
+        self._postings_tfs = [array("I", tfs[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(offsets) - 1)]
+        self._doc_lengths = array("I", arrays["doc_lengths"].astype(np.uint32).tobytes())
+        self._log_offsets = array("Q", arrays["log_offsets"].astype(np.uint64).tobytes())
+        self._deleted = bytearray(arrays["deleted"].astype(np.uint8).tobytes())
+        self._doc_numbers = {doc_id: number for number, doc_id in enumerate(self._doc_ids) if not self._deleted[number]}
+        self._live = len(self._doc_numbers)
+        self._total_length = int(arrays["doc_lengths"][~arrays["deleted"].astype(bool)].sum())
+        return meta["log_size"]
+
+    def save(self) -> None:
+        """Write a postings snapshot so the next load can skip re-tokenizing the log."""
+        if self.path is None or self._log is None:
+            return
+        lengths = [len(postings) for postings in self._postings_docs]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        meta = {
+            "terms": sorted(self._vocabulary, key=self._vocabulary.get),
+            "doc_ids": self._doc_ids,
+            "log_size": self._position
+        }
+        # Metadata and postings share one file so they are replaced atomically together
+        temporary = self._file(f"snapshot.npz.{os.getpid()}.tmp")
+        with open(temporary, "wb") as snapshot_file:
+            np.savez(
+                snapshot_file,
+                meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+                offsets=offsets,
+                docs=np.frombuffer(b"".join(p.tobytes() for p in self._postings_docs), dtype=np.uint32),
+                tfs=np.frombuffer(b"".join(p.tobytes() for p in self._postings_tfs), dtype=np.uint32),
+                doc_lengths=np.frombuffer(self._doc_lengths, dtype=np.uint32).copy(),
+                log_offsets=np.frombuffer(self._log_offsets, dtype=np.uint64).copy(),
+                deleted=np.frombuffer(bytes(self._deleted), dtype=np.uint8)
+            )
+        os.replace(temporary, self._file("snapshot.npz"))
+        self._unsaved = 0
+
+    def close(self) -> None:
+        if self._log is not None:
+            self.save()
+            self._log.close()
+            self._reader.close()
+            self._log = self._reader = None
+
+    def _index(self, object_id: str, properties: Dict[str, Any], log_offset: int) -> int:
+        previous = self._doc_numbers.get(object_id)
+        if previous is not None:
+            self._deleted[previous] = 1
+            self._live -= 1
+            self._total_length -= self._doc_lengths[previous]
+
+        number = len(self._doc_ids)
+        terms = tokenize(str(properties.get(self.field) or ""))
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                term_id = self._vocabulary[term] = len(self._postings_docs)
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("I"))
+            self._postings_docs[term_id].append(number)
+            self._postings_tfs[term_id].append(count)
+
+        self._doc_ids.append(object_id)
+        self._doc_numbers[object_id] = number
+        self._doc_lengths.append(len(terms))
+        self._log_offsets.append(log_offset)
+        self._deleted.append(0)
+        self._live += 1
+        self._total_length += len(terms)
+        return number
+
+    def add_many(self, documents: Iterable[Tuple[str, Dict[str, Any]]]) -> List[int]:
+        """Index (id, properties) pairs, logging them to disk first when the index has a path.
+
+        Returns the document number given to each one.
+        """
+        documents = list(documents)
+        if self.path is None:
+            return [self._index(object_id, properties, 0) for object_id, properties in documents]
+        if self._log is None:
+            self.load()
+        payload = b"".join(
+            json.dumps({"id": object_id, "properties": properties}, default=str).encode() + b"\n"
+            for object_id, properties in documents
+        )
+        with self._locked():
+            self._log.write(payload)
+            self._log.flush()
+        self.refresh()
+        if self._unsaved >= BM25_SNAPSHOT_EVERY:
+            self.save()
+        return [self._doc_numbers[object_id] for object_id, _ in documents]
+
+    def match(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the numbers and BM25 scores of every live document matching the query."""
+        if not self._live:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+        lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+        average_length = max(self._total_length / self._live, 1.0)
+        for term in set(tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            docs = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+            tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint32).astype(np.float32)
+            idf = math.log(1 + (self._live - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        scores[np.frombuffer(self._deleted, dtype=np.bool_)] = 0
+        matched = np.flatnonzero(scores > 0)
+        return matched, scores[matched]
+
+    def _properties(self, number: int) -> Dict[str, Any]:
+        self._reader.seek(self._log_offsets[number])
+        return json.loads(self._reader.readline())["properties"]
+
+    def search(
+        self, query: str, limit: int = 5, return_properties: Optional[List[str]] = None, offset: int = 0
+    ) -> List[SearchHit]:
+        """Return the top documents for the query (after skipping offset), read back from the on-disk log."""
+        if self.path is not None and self._log is None:
+            self.load()
+        if self._reader is None:
+            return []
+        self.refresh()
+        numbers, scores = self.match(query)
+        hits = []
+        for i in top_k(scores, offset + limit)[offset:]:
+            properties = self._properties(int(numbers[i]))
+            if return_properties is not None:
+                properties = {key: value for key, value in properties.items() if key in return_properties}
+            hits.append(SearchHit(self._doc_ids[numbers[i]], properties, score=float(scores[i])))
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        postings = sum(len(p) for p in self._postings_docs)
+        return {
+            "documents": self._live,
+            "terms": len(self._vocabulary),
+            "postings": postings,
+            "postings_bytes": postings * 8,
+            "unsaved": self._unsaved
+        }
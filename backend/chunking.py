@@ -0,0 +1,96 @@
+import os
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Tuple, Union
+
+# Chunking settings (sizes are in characters)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+
+def _split_point(buffer: str, chunk_size: int, start: int = 0) -> int:
+    """Find where to cut a full buffer, preferring the last whitespace in the second half.
+
+    The cut is relative to start, the position in buffer where the chunk begins.
+    """
+    end = start + chunk_size
+    cut = buffer.rfind(" ", start + chunk_size // 2, end)
+    newline = buffer.rfind("\n", start + chunk_size // 2, end)
+    cut = max(cut, newline)
+    return cut + 1 - start if cut != -1 else chunk_size
+
+
+class Chunker:
+    """Incremental splitter behind iter_chunks and aiter_chunks.
+
+    feed() takes the next piece of text and returns the chunks it completed;
+    finish() returns whatever is left once the input ends.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = max(1, chunk_size)
+        self.overlap = max(0, min(overlap, self.chunk_size - 1))
+        self._buffer = ""
+        self._start = 0  # Where the next chunk begins in buffer; earlier text is consumed
+        self._offset = 0  # Position of buffer[start] in the full text
+        self._covered = 0  # Characters from start already emitted
+        self._index = 0
+
+    def feed(self, piece: str) -> List[Tuple[int, int, str]]:
+        chunks = []
+        # Drop consumed text once per piece rather than once per chunk, so a
+        # whole document fed as one string is not copied for every chunk.
+        self._buffer = self._buffer[self._start:] + piece
+        self._start = 0
+        while len(self._buffer) - self._start > self.chunk_size:
+            cut = _split_point(self._buffer, self.chunk_size, self._start)
+            chunks.append((self._index, self._offset, self._buffer[self._start:self._start + cut]))
+            self._index += 1
+            advance = cut - self.overlap if cut > self.overlap else cut
+            self._start += advance
+            self._offset += advance
+            self._covered = cut - advance
+        return chunks
+
+    def finish(self) -> List[Tuple[int, int, str]]:
+        rest = self._buffer[self._start:]
+        if len(rest) > self._covered or self._index == 0:
+            return [(self._index, self._offset, rest)]
+        return []
+
+
+def iter_chunks(
+    pieces: Union[str, Iterable[str]],
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> Iterator[Tuple[int, int, str]]:
+    """Split text into overlapping chunks of at most chunk_size characters.
+
+    Accepts either a whole string or an iterable of text pieces, so callers can
+    stream text in and only about one chunk is held in memory at a time.
+    Yields (chunk_index, offset, text) tuples, where offset is the character
+    position of the chunk in the full text. Empty input yields a single empty
+    chunk so every file is still represented by at least one object.
+    """
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    chunker = Chunker(chunk_size, overlap)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
+
+async def aiter_chunks(
+    pieces: Union[str, AsyncIterable[str]],
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> AsyncIterator[Tuple[int, int, str]]:
+    """Async counterpart of iter_chunks for text streamed from an upload."""
+    chunker = Chunker(chunk_size, overlap)
+    if isinstance(pieces, str):
+        for chunk in chunker.feed(pieces):
+            yield chunk
+    else:
+        async for piece in pieces:
+            for chunk in chunker.feed(piece):
+                yield chunk
+    for chunk in chunker.finish():
+        yield chunk
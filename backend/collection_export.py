@@ -0,0 +1,138 @@
+"""Export a collection as gzip-compressed JSON lines.
+
+Used by GET /documents/export, or standalone to write a local file:
+
+    python collection_export.py --output documents.jsonl.gz [--vectors]
+"""
+import os
+import zlib
+import time
+import asyncio
+import argparse
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from serialization import dumps
+from structured_logging import get_logger
+from vector_store import SearchHit, StoreCollection, create_vector_store
+
+# Objects fetched per cursor page when listing or exporting
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+EXPORT_COMPRESSION_LEVEL = int(os.getenv("EXPORT_COMPRESSION_LEVEL", "6"))
+
+logger = get_logger("export")
+
+
+def object_record(hit: SearchHit, include_vector: bool = False) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"id": hit.uuid, "properties": hit.properties}
+    if include_vector:
+        record["vector"] = hit.vector
+    return record
+
+
+async def iter_objects(
+    collection: StoreCollection,
+    page_size: int = EXPORT_PAGE_SIZE,
+    return_properties: Optional[List[str]] = None,
+    include_vector: bool = False,
+) -> AsyncIterator[SearchHit]:
+    """Walk the whole collection in id order, holding one cursor page at a time."""
+    after = None
+    while True:
+        page = await collection.list_objects(
+            after=after, limit=page_size, return_properties=return_properties, include_vector=include_vector
+        )
+        for hit in page:
+            yield hit
+        if len(page) < page_size:
+            return
+        after = page[-1].uuid
+
+
+async def gzip_jsonl(records: AsyncIterable[Dict[str, Any]], level: int = EXPORT_COMPRESSION_LEVEL) -> AsyncIterator[bytes]:
+    """Encode records as JSON lines and gzip them incrementally.
+
+    Compressed output is yielded whenever zlib has some, so memory stays
+    bounded by the compressor window however large the export is.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header
+    async for record in records:
+        compressed = compressor.compress(dumps(record) + b"\n")
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def export_records(
+    collection: StoreCollection,
+    include_vector: bool = False,
+    return_properties: Optional[List[str]] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    async for hit in iter_objects(collection, page_size, return_properties, include_vector):
+        yield object_record(hit, include_vector)
+
+
+async def export_to_file(
+    collection: StoreCollection,
+    path: str,
+    include_vector: bool = False,
+    return_properties: Optional[List[str]] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> int:
+    """Write the collection to path as .jsonl.gz, returning the number of objects written.
+
+    The file is written next to path and renamed into place once complete.
+    """
+    count = 0
+
+    async def counted():
+        nonlocal count
+        async for record in export_records(collection, include_vector, return_properties, page_size):
+            count += 1
+            yield record
+
+    temporary = f"{path}.partial"
+    with open(temporary, "wb") as output:
+        async for block in gzip_jsonl(counted()):
+            output.write(block)
+    os.replace(temporary, path)
+    return count
+
+
+async def run(args: argparse.Namespace) -> None:
+    store = create_vector_store(os.getenv("WEAVIATE_URL"), os.getenv("WEAVIATE_API_KEY"))
+    await store.connect()
+    try:
+        collection = await store.get_collection(args.collection)
+        if collection is None:
+            raise SystemExit(f"Collection {args.collection} does not exist")
+        started = time.perf_counter()
+        count = await export_to_file(
+            collection,
+            args.output,
+            include_vector=args.vectors,
+            return_properties=args.fields.split(",") if args.fields else None,
+            page_size=args.page_size
+        )
+        elapsed = time.perf_counter() - started
+        print(f"Exported {count} objects to {args.output} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} objects/s)")
+    finally:
+        await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export a collection as gzip-compressed JSON lines.")
+    parser.add_argument("--output", required=True, help="Path of the .jsonl.gz file to write")
+    parser.add_argument("--collection", default="Document")
+    parser.add_argument("--vectors", action="store_true", help="Include each object's vector")
+    parser.add_argument("--fields", help="Comma-separated properties to export (default: all)")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
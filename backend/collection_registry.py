@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+from structured_logging import get_logger
+
+# How long (in seconds) the cached collection list is trusted before re-fetching
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+# A lookup of a missing collection reloads the list if it is older than this (0: always),
+# so collections created by another worker or process show up right away
+SCHEMA_MISS_TTL = float(os.getenv("SCHEMA_MISS_TTL", "0"))
+
+logger = get_logger("collection_registry")
+
+
+class CollectionRegistry:
+    """Caches which collections exist, their configs and their handles.
+
+    The collection list is loaded once with list_all() and reused until the
+    TTL expires or invalidate() is called (e.g. after creating a collection),
+    so request handlers do not pay a schema round trip on every call. A
+    collection missing from the list is only trusted to be missing for
+    miss_ttl seconds, since another worker may have just created it.
+    """
+
+    def __init__(self, ttl: float = SCHEMA_CACHE_TTL, miss_ttl: float = SCHEMA_MISS_TTL):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.client = None
+        self._configs: Dict[str, Any] = {}
+        self._handles: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def bind(self, client) -> None:
+        """Attach the Weaviate client the registry loads collections from."""
+        self.client = client
+        self._handles.clear()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Force the next lookup to reload the collection list."""
+        self._loaded_at = None
+
+    async def refresh(self) -> None:
+        """Reload the collection list and configs from Weaviate."""
+        self._configs = dict(await self.client.collections.list_all())
+        self._loaded_at = time.monotonic()
+        logger.info(f"Collection registry loaded: {sorted(self._configs)}")
+
+    def _stale(self, max_age: float) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= max_age
+
+    async def _ensure_fresh(self, name: Optional[str] = None) -> None:
+        """Reload the list once the TTL expires, or sooner when name is missing from it."""
+        max_age = self.ttl if name is None or name in self._configs else min(self.ttl, self.miss_ttl)
+        if not self._stale(max_age):
+            return
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._stale(max_age):
+                await self.refresh()
+
+    async def exists(self, name: str) -> bool:
+        await self._ensure_fresh(name)
+        return name in self._configs
+
+    async def config(self, name: str) -> Optional[Any]:
+        """Return the cached (simple) config of a collection, or None if it does not exist."""
+        await self._ensure_fresh(name)
+        return self._configs.get(name)
+
+    async def get(self, name: str) -> Optional[Any]:
+        """Return a cached collection handle, or None if the collection does not exist."""
+        if not await self.exists(name):
+            return None
+        if name not in self._handles:
+            self._handles[name] = self.client.collections.get(name)
+        return self._handles[name]
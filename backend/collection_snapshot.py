@@ -0,0 +1,355 @@
+"""Snapshot a collection with its vectors and restore it without re-vectorizing.
+
+A snapshot is a directory of flat, memory-mappable column files:
+
+    manifest.json           collection, count, vector dimension and property spec
+    ids.bin                 count x 16 bytes, the object UUIDs
+    vectors.f32             count x dim float32 matrix, row i belongs to ids[i]
+    vectors.nulls           count x uint8, 1 where the object had no vector
+    <property>.offsets      text and date columns: count + 1 int64 offsets ...
+    <property>.bin          ... into one UTF-8 blob, dates as ISO 8601 strings
+    <property>.values       int (int64) and number (float64) columns
+    <property>.nulls        count x uint8, 1 where the property was missing
+
+Restoring inserts the objects in batches with their stored vectors, so the
+cluster's vectorizer is skipped. Use it to rebuild Document after a schema
+change without re-uploading every file:
+
+    python collection_snapshot.py create --output snapshots/document
+    python collection_snapshot.py restore --input snapshots/document
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from weaviate.classes.data import DataObject
+
+from bm25_index import BM25Index, BM25_INDEX_ENABLED
+from collection_export import EXPORT_PAGE_SIZE, iter_objects
+from result_cache import CacheVersion
+from structured_logging import get_logger
+from vector_store import (
+    PropertySpec,
+    StoreCollection,
+    WEAVIATE_BATCH_CONCURRENCY,
+    WEAVIATE_BATCH_SIZE,
+    create_vector_store,
+    insert_batched,
+)
+
+SNAPSHOT_FORMAT = 1
+
+logger = get_logger("snapshot")
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class _ColumnWriter:
+    """Appends one property's values, page by page, to its column files."""
+
+    def __init__(self, directory: str, name: str, prop_type: str):
+        self.name = name
+        self.prop_type = prop_type
+        self.nulls = open(os.path.join(directory, f"{name}.nulls"), "wb")
+        if prop_type in ("int", "number"):
+            self.values = open(os.path.join(directory, f"{name}.values"), "wb")
+            self.dtype = np.int64 if prop_type == "int" else np.float64
+        else:
+            self.offsets = open(os.path.join(directory, f"{name}.offsets"), "wb")
+            self.blob = open(os.path.join(directory, f"{name}.bin"), "wb")
+            self.offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+            self.end = 0
+
+    def write(self, values: List[Any]) -> None:
+        missing = [value is None for value in values]
+        self.nulls.write(np.array(missing, dtype=np.uint8).tobytes())
+        if self.prop_type in ("int", "number"):
+            column = [0 if value is None else value for value in values]
+            self.values.write(np.array(column, dtype=self.dtype).tobytes())
+            return
+        encoded = [b"" if value is None else _text(value).encode("utf-8") for value in values]
+        ends = self.end + np.cumsum([len(chunk) for chunk in encoded], dtype=np.int64)
+        self.offsets.write(ends.tobytes())
+        self.blob.write(b"".join(encoded))
+        if len(ends):
+            self.end = int(ends[-1])
+
+    def close(self) -> None:
+        for attribute in ("nulls", "values", "offsets", "blob"):
+            handle = getattr(self, attribute, None)
+            if handle is not None:
+                handle.close()
+
+
+async def create_snapshot(collection: StoreCollection, path: str, page_size: int = EXPORT_PAGE_SIZE) -> Dict[str, Any]:
+    """Write every object of the collection, with its vector, to a snapshot directory at path.
+
+    Pages are streamed straight to the column files, so memory stays bounded
+    by one page. The snapshot is built next to path and renamed into place
+    once its manifest is written. Returns the manifest.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    properties = [(prop_name, prop_type) for prop_name, prop_type in await collection.property_spec()]
+    temporary = f"{path}.partial"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    columns = [_ColumnWriter(temporary, prop_name, prop_type) for prop_name, prop_type in properties]
+    count = 0
+    dim: Optional[int] = None
+    pending_nulls = 0  # Objects without a vector seen before the dimension was known
+    try:
+        with open(os.path.join(temporary, "ids.bin"), "wb") as ids_file, \
+                open(os.path.join(temporary, "vectors.f32"), "wb") as vectors_file, \
+                open(os.path.join(temporary, "vectors.nulls"), "wb") as vector_nulls_file:
+            page: List[Any] = []
+
+            def write_page() -> None:
+                nonlocal count, dim, pending_nulls
+                ids_file.write(b"".join(uuid.UUID(hit.uuid).bytes for hit in page))
+                for column in columns:
+                    column.write([hit.properties.get(column.name) for hit in page])
+
+                missing = [hit.vector is None for hit in page]
+                vector_nulls_file.write(np.array(missing, dtype=np.uint8).tobytes())
+                if dim is None:
+                    first = next((hit.vector for hit in page if hit.vector is not None), None)
+                    if first is None:
+                        pending_nulls += len(page)
+                        count += len(page)
+                        return
+                    dim = len(first)
+                    vectors_file.write(np.zeros((pending_nulls, dim), dtype=np.float32).tobytes())
+                matrix = np.zeros((len(page), dim), dtype=np.float32)
+                for row, hit in enumerate(page):
+                    if hit.vector is None:
+                        continue
+                    if len(hit.vector) != dim:
+                        raise ValueError(f"Object {hit.uuid} has a {len(hit.vector)}-dimensional vector, expected {dim}")
+                    matrix[row] = hit.vector
+                vectors_file.write(matrix.tobytes())
+                count += len(page)
+
+            async for hit in iter_objects(collection, page_size, include_vector=True):
+                page.append(hit)
+                if len(page) >= page_size:
+                    write_page()
+                    page = []
+            if page:
+                write_page()
+    finally:
+        for column in columns:
+            column.close()
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "collection": collection.name,
+        "count": count,
+        "dim": dim or 0,
+        "properties": properties,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat()
+    }
+    with open(os.path.join(temporary, "manifest.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(temporary, path)
+    return manifest
+
+
+class Snapshot:
+    """Read-only view of a snapshot directory, with every column memory-mapped."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')!r}")
+        self.count = self.manifest["count"]
+        self.dim = self.manifest["dim"]
+        self.properties: PropertySpec = [tuple(prop) for prop in self.manifest["properties"]]
+        self.ids = self._map("ids.bin", np.uint8, (self.count, 16))
+        self.vectors = self._map("vectors.f32", np.float32, (self.count, self.dim)) if self.dim else None
+        self.vector_nulls = self._map("vectors.nulls", np.uint8, (self.count,))
+        self.columns: Dict[str, Tuple[str, Any, Any, np.ndarray]] = {}
+        for prop_name, prop_type in self.properties:
+            nulls = self._map(f"{prop_name}.nulls", np.uint8, (self.count,))
+            if prop_type in ("int", "number"):
+                dtype = np.int64 if prop_type == "int" else np.float64
+                self.columns[prop_name] = (prop_type, self._map(f"{prop_name}.values", dtype, (self.count,)), None, nulls)
+            else:
+                offsets = self._map(f"{prop_name}.offsets", np.int64, (self.count + 1,))
+                blob = self._map(f"{prop_name}.bin", np.uint8, (int(offsets[-1]),))
+                self.columns[prop_name] = (prop_type, offsets, blob, nulls)
+
+    def _map(self, filename: str, dtype, shape) -> np.ndarray:
+        # np.memmap cannot map an empty file
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r", shape=shape)
+
+    def objects(self, start: int, stop: int, properties: Optional[List[str]] = None) -> List[DataObject]:
+        """Rows start to stop as DataObjects carrying their stored vectors."""
+        names = list(self.columns) if properties is None else properties
+        columns: Dict[str, List[Any]] = {}
+        for prop_name in names:
+            prop_type, values, blob, nulls = self.columns[prop_name]
+            if blob is None:
+                decoded = values[start:stop].tolist()
+            else:
+                decoded = [
+                    bytes(blob[begin:end]).decode("utf-8")
+                    for begin, end in zip(values[start:stop].tolist(), values[start + 1:stop + 1].tolist())
+                ]
+            missing = nulls[start:stop].tolist()
+            columns[prop_name] = [None if null else value for value, null in zip(decoded, missing)]
+
+        objects = []
+        for offset, row in enumerate(range(start, stop)):
+            vector = None
+            if self.vectors is not None and not self.vector_nulls[row]:
+                vector = self.vectors[row].tolist()
+            objects.append(DataObject(
+                properties={
+                    prop_name: column[offset] for prop_name, column in columns.items() if column[offset] is not None
+                },
+                uuid=uuid.UUID(bytes=bytes(self.ids[row])),
+                vector=vector
+            ))
+        return objects
+
+
+async def restore_snapshot(
+    snapshot: Snapshot,
+    collection: StoreCollection,
+    batch_size: int = WEAVIATE_BATCH_SIZE,
+    concurrency: int = WEAVIATE_BATCH_CONCURRENCY,
+    keyword_index: Optional[BM25Index] = None,
+) -> Dict[str, Any]:
+    """Insert every snapshot object into collection with its stored vector.
+
+    Only properties the collection still has are restored. Rows are decoded
+    batch_size * concurrency at a time, so memory stays bounded however large
+    the snapshot is. Objects the store accepts are also added to
+    keyword_index when one is given. Returns counts and throughput.
+    """
+    target = {prop_name for prop_name, _ in await collection.property_spec()}
+    properties = [prop_name for prop_name, _ in snapshot.properties if prop_name in target]
+    skipped = [prop_name for prop_name, _ in snapshot.properties if prop_name not in target]
+    if skipped:
+        logger.warning(f"{collection.name} has no {', '.join(skipped)} properties, not restoring them")
+
+    window = max(1, batch_size) * max(1, concurrency)
+    inserted = failed = 0
+    first_error = None
+    started = time.perf_counter()
+    for start in range(0, snapshot.count, window):
+        objects = snapshot.objects(start, min(start + window, snapshot.count), properties)
+        errors = await insert_batched(collection, objects, batch_size, concurrency)
+        if errors and first_error is None:
+            first_error = next(iter(errors.values()))
+        inserted += len(objects) - len(errors)
+        failed += len(errors)
+        if keyword_index is not None:
+            keyword_index.add_many(
+                (str(obj.uuid), obj.properties) for i, obj in enumerate(objects) if i not in errors
+            )
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Restored {inserted + failed}/{snapshot.count} objects ({failed} failed), "
+            f"{(inserted + failed) / max(elapsed, 1e-9):.0f} objects/s"
+        )
+
+    elapsed = time.perf_counter() - started
+    if first_error is not None:
+        logger.warning(f"{failed} objects failed to insert, first error: {first_error}")
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "seconds": elapsed,
+        "objects_per_second": inserted / max(elapsed, 1e-9)
+    }
+
+
+async def run_create(args: argparse.Namespace) -> None:
+    store = create_vector_store(os.getenv("WEAVIATE_URL"), os.getenv("WEAVIATE_API_KEY"))
+    await store.connect()
+    try:
+        collection = await store.get_collection(args.collection)
+        if collection is None:
+            raise SystemExit(f"Collection {args.collection} does not exist")
+        started = time.perf_counter()
+        manifest = await create_snapshot(collection, args.output, args.page_size)
+        elapsed = time.perf_counter() - started
+        count = manifest["count"]
+        print(
+            f"Wrote {count} objects ({manifest['dim']}-dimensional vectors) to {args.output} "
+            f"in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} objects/s)"
+        )
+    finally:
+        await store.close()
+
+
+async def run_restore(args: argparse.Namespace) -> None:
+    snapshot = Snapshot(args.input)
+    name = args.collection or snapshot.manifest["collection"]
+    store = create_vector_store(os.getenv("WEAVIATE_URL"), os.getenv("WEAVIATE_API_KEY"))
+    await store.connect()
+    keyword_index = BM25Index() if BM25_INDEX_ENABLED and not args.no_keyword_index else None
+    try:
+        collection = await store.get_collection(name)
+        if collection is None:
+            collection = await store.create_collection(name, snapshot.properties)
+        result = await restore_snapshot(snapshot, collection, args.batch_size, args.concurrency, keyword_index)
+        if result["inserted"]:
+            # Running servers cache search and chat results; tell them the data changed
+            CacheVersion().bump()
+        print(
+            f"Restored {result['inserted']} objects into {name} in {result['seconds']:.1f}s "
+            f"({result['objects_per_second']:.0f} objects/s, {result['failed']} failed)"
+        )
+    finally:
+        if keyword_index is not None:
+            keyword_index.close()
+        await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snapshot a collection with its vectors, or restore one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="Write a collection to a snapshot directory")
+    create.add_argument("--output", required=True, help="Snapshot directory to create")
+    create.add_argument("--collection", default="Document")
+    create.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+
+    restore = commands.add_parser("restore", help="Insert a snapshot's objects with their stored vectors")
+    restore.add_argument("--input", required=True, help="Snapshot directory to read")
+    restore.add_argument("--collection", help="Target collection (default: the one snapshotted)")
+    restore.add_argument("--batch-size", type=int, default=WEAVIATE_BATCH_SIZE)
+    restore.add_argument("--concurrency", type=int, default=WEAVIATE_BATCH_CONCURRENCY)
+    restore.add_argument(
+        "--no-keyword-index", action="store_true", help="Do not add restored objects to the local BM25 index"
+    )
+
+    args = parser.parse_args()
+    asyncio.run(run_create(args) if args.command == "create" else run_restore(args))
+
+
+if __name__ == "__main__":
+    main()
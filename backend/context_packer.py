@@ -0,0 +1,92 @@
+import os
+import re
+import math
+from typing import Any, Dict, List, Tuple
+
+from prompts import chunk_header
+from snippets import truncate_utf8
+
+# Prompt context budget settings (0 disables the limit)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_BYTES_PER_TOKEN = float(os.getenv("CONTEXT_BYTES_PER_TOKEN", "4"))
+# Chunks are not truncated to fewer tokens than this; the space is left unused instead
+CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "32"))
+
+# Ends of sentences (Latin and CJK punctuation) and paragraph breaks
+_SENTENCE_END = re.compile(r"[.!?。！？](?=\s|$)|\n")
+_WHITESPACE = re.compile(r"\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count from the UTF-8 length.
+
+    English averages about four bytes per token and a three-byte CJK character
+    is a little under one token, so bytes / CONTEXT_BYTES_PER_TOKEN stays close
+    for both without running a tokenizer.
+    """
+    return math.ceil(len(text.encode("utf-8")) / CONTEXT_BYTES_PER_TOKEN)
+
+
+def truncate_to_sentence(text: str, max_tokens: int) -> str:
+    """Longest prefix of text ending on a sentence boundary that fits in max_tokens.
+
+    Falls back to a word boundary when the allowance holds no complete
+    sentence, and to an empty string when it holds no complete word either.
+    """
+    prefix = truncate_utf8(text, int(max_tokens * CONTEXT_BYTES_PER_TOKEN))
+    if len(prefix) == len(text):
+        return text
+    ends = [match.end() for match in _SENTENCE_END.finditer(prefix)]
+    if ends:
+        return prefix[:ends[-1]].rstrip()
+    spaces = [match.start() for match in _WHITESPACE.finditer(prefix)]
+    return prefix[:spaces[-1]].rstrip() if spaces else ""
+
+
+def pack_context(
+    documents: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Fill the token budget with retrieved chunks, best first.
+
+    documents must already be ranked, as retrieve_documents returns them.
+    Chunks are kept whole while they fit; the first one that does not is cut
+    on a sentence boundary and everything after it is dropped, so a lower
+    ranked chunk never displaces a higher ranked one. Each chunk's cost
+    includes the "Document: <filename>" header the prompt adds. Returns the
+    packed chunks and a summary of tokens used and dropped.
+    """
+    packed: List[Dict[str, Any]] = []
+    used = dropped = truncated = 0
+    remaining = max(0, budget) if budget != 0 else None
+    for document in documents:
+        content = str(document.get("content") or "")
+        header_tokens = estimate_tokens(chunk_header(document))
+        content_tokens = estimate_tokens(content)
+        if remaining is None or header_tokens + content_tokens <= remaining:
+            packed.append(document)
+            used += header_tokens + content_tokens
+            if remaining is not None:
+                remaining -= header_tokens + content_tokens
+            continue
+
+        allowance = remaining - header_tokens
+        cut = truncate_to_sentence(content, allowance) if allowance >= CONTEXT_MIN_CHUNK_TOKENS else ""
+        if cut:
+            cut_tokens = estimate_tokens(cut)
+            packed.append(dict(document, content=cut))
+            used += header_tokens + cut_tokens
+            dropped += content_tokens - cut_tokens
+            truncated += 1
+            remaining -= header_tokens + cut_tokens
+        else:
+            dropped += header_tokens + content_tokens
+        # The budget is spent; count the rest as dropped
+        remaining = 0
+    return packed, {
+        "budget": budget,
+        "tokens_used": used,
+        "tokens_dropped": dropped,
+        "chunks_used": len(packed),
+        "chunks_dropped": len(documents) - len(packed),
+        "chunks_truncated": truncated
+    }
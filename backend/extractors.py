@@ -0,0 +1,193 @@
+import os
+import asyncio
+import mimetypes
+import multiprocessing
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Optional
+
+from metrics import EXTRACTIONS
+from structured_logging import get_logger
+
+# Text extraction settings
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS") or max(1, (os.cpu_count() or 2) // 2))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "60"))
+
+# Extractors by lowercase extension (".pdf") and by MIME type ("application/pdf").
+# Each one takes a file path and returns plain text. They run in worker
+# processes, so they must be module-level functions.
+EXTRACTORS: Dict[str, Callable[[str], str]] = {}
+
+logger = get_logger("extractors")
+
+
+class ExtractionError(Exception):
+    """Raised when a file's text cannot be extracted."""
+
+
+def register_extractor(
+    extractor: Callable[[str], str], extensions: Iterable[str] = (), mime_types: Iterable[str] = ()
+) -> None:
+    for extension in extensions:
+        EXTRACTORS[extension.lower()] = extractor
+    for mime_type in mime_types:
+        EXTRACTORS[mime_type.lower()] = extractor
+
+
+def find_extractor(filename: str, content_type: Optional[str] = None) -> Optional[Callable[[str], str]]:
+    """Return the extractor for a file, or None if it should be read as plain text.
+
+    The extension wins over the declared content type, since browsers often
+    send application/octet-stream for anything they don't recognise.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in EXTRACTORS:
+        return EXTRACTORS[extension]
+    mime_type = (content_type or mimetypes.guess_type(filename or "")[0] or "").split(";")[0].strip().lower()
+    return EXTRACTORS.get(mime_type)
+
+
+def extract_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError("PDF extraction requires the pypdf package")
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_docx(path: str) -> str:
+    try:
+        import docx
+    except ImportError:
+        raise ExtractionError("DOCX extraction requires the python-docx package")
+    document = docx.Document(path)
+    return "\n".join(paragraph.text for paragraph in document.paragraphs)
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects visible text, skipping script and style contents."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def extract_html(path: str) -> str:
+    parser = _HTMLTextParser()
+    with open(path, encoding="utf-8", errors="ignore") as html_file:
+        while True:
+            block = html_file.read(64 * 1024)
+            if not block:
+                break
+            parser.feed(block)
+    parser.close()
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+register_extractor(extract_pdf, [".pdf"], ["application/pdf"])
+register_extractor(
+    extract_docx,
+    [".docx"],
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+)
+register_extractor(extract_html, [".html", ".htm", ".xhtml"], ["text/html", "application/xhtml+xml"])
+
+
+class ExtractionPool:
+    """Runs extractors in a process pool so CPU-bound parsing stays off the event loop.
+
+    The pool is created on first use, with spawned workers: forking lazily
+    would copy the gRPC client and threads the server already has running.
+    At most one extraction per worker is submitted at a time, so
+    EXTRACT_TIMEOUT measures parsing alone, not waiting for a free worker.
+    A parse that times out would otherwise hold its worker until it
+    finished, so the pool is terminated and recreated; extractions that were
+    running alongside it are retried once on the new pool.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, timeout: float = EXTRACT_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._generation = 0  # Incremented whenever the pool is killed
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _restart(self) -> None:
+        """Kill every worker process, including one stuck in a parse."""
+        executor, self._executor = self._executor, None
+        self._generation += 1
+        if executor is None:
+            return
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, extractor: Callable[[str], str], path: str) -> str:
+        for attempt in range(2):
+            generation = self._generation
+            try:
+                future = asyncio.get_running_loop().run_in_executor(self._pool(), extractor, path)
+                return await asyncio.wait_for(future, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Extraction of {path} timed out after {self.timeout} seconds, restarting the pool")
+                self._restart()
+                raise
+            except BrokenProcessPool:
+                killed_for_timeout = generation != self._generation
+                if not killed_for_timeout:
+                    # A worker died on its own (e.g. ran out of memory); start over with a fresh pool
+                    self._restart()
+                if attempt or not killed_for_timeout:
+                    raise
+
+    async def extract(self, extractor: Callable[[str], str], path: str) -> str:
+        """Run extractor(path) in the pool, returning the text or raising ExtractionError."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            try:
+                text = await self._run(extractor, path)
+            except asyncio.TimeoutError:
+                EXTRACTIONS.inc(outcome="timeout")
+                raise ExtractionError(f"Text extraction timed out after {self.timeout} seconds")
+            except ExtractionError:
+                EXTRACTIONS.inc(outcome="failed")
+                raise
+            except Exception as extract_error:
+                EXTRACTIONS.inc(outcome="failed")
+                raise ExtractionError(f"Text extraction failed: {extract_error}")
+        EXTRACTIONS.inc(outcome="ok")
+        return text
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
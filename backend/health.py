@@ -0,0 +1,93 @@
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from structured_logging import get_logger
+
+# Readiness probe settings (intervals and timeouts in seconds)
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+HEALTH_FAILURE_THRESHOLD = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "3"))
+
+logger = get_logger("health")
+
+
+class HealthMonitor:
+    """Polls a dependency in the background so probes can read its state for free.
+
+    The check is an async callable returning True when the dependency is
+    usable. Readiness only flips to false after HEALTH_FAILURE_THRESHOLD
+    consecutive failed or timed-out checks, so a single slow round trip does
+    not take the instance out of rotation, and back to true on the first
+    success.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[], Awaitable[bool]],
+        interval: float = HEALTH_CHECK_INTERVAL,
+        timeout: float = HEALTH_CHECK_TIMEOUT,
+        failure_threshold: int = HEALTH_FAILURE_THRESHOLD,
+    ):
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.ready = False
+        self.consecutive_failures = 0
+        self.last_checked: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # Check once up front so the first probe already has a real answer
+        await self.run_check()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_check()
+
+    async def run_check(self) -> None:
+        started = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(self.check(), self.timeout)
+            error = None if ok else "not ready"
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.timeout} seconds"
+        except Exception as check_error:
+            ok, error = False, str(check_error)
+        self.last_latency = time.perf_counter() - started
+        self.last_checked = time.time()
+        self.last_error = error
+
+        if ok:
+            if not self.ready:
+                logger.info("Dependency check passed, instance is ready")
+            self.ready = True
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        logger.warning(f"Dependency check failed ({self.consecutive_failures} in a row): {error}")
+        if self.ready and self.consecutive_failures >= self.failure_threshold:
+            logger.warning("Marking instance not ready")
+            self.ready = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "last_checked": self.last_checked,
+            "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "check_interval": self.interval
+        }
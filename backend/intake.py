@@ -0,0 +1,105 @@
+import os
+import codecs
+import hashlib
+import tempfile
+from typing import AsyncIterator, Optional, Tuple
+
+# Upload intake settings (sizes in bytes)
+UPLOAD_READ_BLOCK = int(os.getenv("UPLOAD_READ_BLOCK", str(64 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """Raised when a file or a whole upload request exceeds its size limit."""
+
+
+class RequestBudget:
+    """Tracks how many bytes an upload request may still read across all of its files."""
+
+    def __init__(self, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def consume(self, size: int) -> None:
+        self.used += size
+        if self.used > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the request size limit of {self.max_bytes} bytes")
+
+
+class StreamedFile:
+    """Reads an UploadFile in fixed-size blocks and decodes it as UTF-8 incrementally.
+
+    Only one block of bytes and its decoded text are held at a time, so memory
+    use does not grow with the file size. Invalid UTF-8 is dropped, matching
+    the previous decode(errors="ignore") behaviour.
+    """
+
+    def __init__(
+        self,
+        file,
+        budget: Optional[RequestBudget] = None,
+        block_size: int = UPLOAD_READ_BLOCK,
+        max_bytes: int = UPLOAD_MAX_FILE_BYTES,
+    ):
+        self.file = file
+        self.budget = budget
+        self.block_size = max(1, block_size)
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self._budgeted = 0  # Bytes already charged to the request budget by an earlier pass
+
+    def check_declared_size(self) -> None:
+        """Reject a file up front when its size is already known to be over the limit."""
+        size = getattr(self.file, "size", None)
+        if size is not None and size > self.max_bytes:
+            raise UploadTooLarge(f"File is {size} bytes, over the limit of {self.max_bytes} bytes")
+
+    async def blocks(self) -> AsyncIterator[bytes]:
+        """Yield the raw file contents block by block, enforcing both size limits."""
+        while True:
+            block = await self.file.read(self.block_size)
+            if not block:
+                return
+            self.bytes_read += len(block)
+            if self.bytes_read > self.max_bytes:
+                raise UploadTooLarge(f"File exceeds the limit of {self.max_bytes} bytes")
+            if self.budget is not None and self.bytes_read > self._budgeted:
+                self.budget.consume(self.bytes_read - self._budgeted)
+                self._budgeted = self.bytes_read
+            yield block
+
+    async def sha256(self) -> str:
+        """Hash the whole file in one streaming pass, then rewind it for reading again."""
+        digest = hashlib.sha256()
+        async for block in self.blocks():
+            digest.update(block)
+        await self.file.seek(0)
+        self.bytes_read = 0
+        return digest.hexdigest()
+
+    async def to_path(self) -> Tuple[str, bool]:
+        """Return a filesystem path holding the file, for parsers that need one.
+
+        Files already on disk (e.g. spooled job uploads) are used in place;
+        anything else is copied block by block to a temporary file. The
+        boolean says whether the caller must delete the returned path.
+        """
+        name = getattr(getattr(self.file, "file", None), "name", None)
+        if isinstance(name, str) and os.path.isfile(name):
+            return name, False
+        with tempfile.NamedTemporaryFile(delete=False) as copy:
+            async for block in self.blocks():
+                copy.write(block)
+        return copy.name, True
+
+    async def text(self) -> AsyncIterator[str]:
+        """Yield decoded text pieces, never splitting a multi-byte character."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        async for block in self.blocks():
+            piece = decoder.decode(block)
+            if piece:
+                yield piece
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from intake import StreamedFile, RequestBudget, UploadTooLarge
+from processes import process_alive
+from structured_logging import get_logger
+
+# Ingestion job queue settings
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_queue.sqlite3")
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "ingest_spool")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+
+logger = get_logger("jobs")
+
+
+class QueueFull(Exception):
+    """Raised when the ingestion queue cannot accept another job right now."""
+
+
+class JobStore:
+    """Persists ingestion jobs and their per-file progress in a local SQLite file."""
+
+    def __init__(self, path: str = INGEST_QUEUE_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                files TEXT NOT NULL,
+                error TEXT,
+                owner INTEGER
+            )"""
+        )
+        # Queues created before jobs had owners
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self.db.commit()
+
+    def create(self, job_id: str, files: List[Dict[str, Any]], owner: Optional[int] = None) -> None:
+        self.db.execute(
+            "INSERT INTO jobs (id, status, created_at, files, owner) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, time.time(), json.dumps(files), owner),
+        )
+        self.db.commit()
+
+    def delete(self, job_id: str) -> None:
+        self.db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self.db.commit()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if "files" in fields:
+            fields["files"] = json.dumps(fields["files"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        self.db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["files"] = json.loads(job["files"])
+        return job
+
+    def claim_unfinished(self, owner: int) -> List[str]:
+        """Take over unfinished jobs whose owning process is gone, returning every job owner now holds.
+
+        Several server workers share the queue file, so jobs still owned by a
+        live sibling are left alone. Each claim is a compare-and-set on the
+        previous owner, so two workers starting together cannot both take a job.
+        """
+        rows = self.db.execute(
+            "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            if row["owner"] == owner:
+                claimed.append(row["id"])
+            elif row["owner"] is None or not process_alive(row["owner"]):
+                cursor = self.db.execute(
+                    "UPDATE jobs SET owner = ? WHERE id = ? AND owner IS ?", (owner, row["id"], row["owner"])
+                )
+                if cursor.rowcount:
+                    claimed.append(row["id"])
+        self.db.commit()
+        return claimed
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class IngestQueue:
+    """Bounded queue of ingestion jobs drained by a fixed pool of background workers.
+
+    Uploaded files are spooled to disk and the job is recorded in SQLite before
+    submit() returns, so unfinished jobs are picked up again after a restart.
+    process is called with the job's file entries, whether the job is being
+    resumed, and a progress callback taking (file_index, result).
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[Dict[str, Any]], bool, Callable[[int, Dict[str, Any]], None]], Awaitable[None]],
+        store: Optional[JobStore] = None,
+        workers: int = INGEST_WORKERS,
+        max_size: int = INGEST_QUEUE_SIZE,
+        spool_dir: str = INGEST_SPOOL_DIR,
+    ):
+        self.process = process
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.spool_dir = spool_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._reserved = 0  # Slots held by submits still spooling their files
+
+    async def start(self) -> None:
+        if self.store is None:
+            self.store = JobStore()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Re-queue jobs left over from a previous run (or a worker that died) without blocking startup
+        unfinished = self.store.claim_unfinished(os.getpid())
+        if unfinished:
+            logger.info(f"Resuming {len(unfinished)} unfinished ingestion jobs")
+            self._tasks.append(asyncio.create_task(self._requeue(unfinished)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+
+    async def _requeue(self, job_ids: List[str]) -> None:
+        for job_id in job_ids:
+            await self._queue.put(job_id)
+
+    async def _spool(self, job_dir: str, uploads) -> List[Dict[str, Any]]:
+        os.makedirs(job_dir)
+        budget = RequestBudget()
+        files = []
+        for position, upload in enumerate(uploads):
+            entry = {"filename": upload.filename, "status": "queued"}
+            path = os.path.join(job_dir, str(position))
+            try:
+                streamed = StreamedFile(upload, budget)
+                streamed.check_declared_size()
+                with open(path, "wb") as spooled:
+                    async for block in streamed.blocks():
+                        spooled.write(block)
+                entry["path"] = path
+            except UploadTooLarge as size_error:
+                entry.update(status="error", error=str(size_error))
+            files.append(entry)
+        return files
+
+    async def submit(self, uploads) -> Dict[str, Any]:
+        """Spool uploads to disk, record the job and queue it. Raises QueueFull when saturated.
+
+        The queue slot is reserved before spooling, which awaits on every
+        block, so concurrent submits cannot all pass the capacity check.
+        """
+        if self._queue is None or self._queue.qsize() + self._reserved >= self.max_size:
+            raise QueueFull("Ingestion queue is full, retry later")
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        self._reserved += 1
+        try:
+            files = await self._spool(job_dir, uploads)
+            self.store.create(job_id, files, owner=os.getpid())
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        finally:
+            self._reserved -= 1
+
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            # Resumed jobs re-queued at startup do not reserve slots, so they can take the last one
+            self.store.delete(job_id)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise QueueFull("Ingestion queue is full, retry later")
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job with per-file progress, throughput and errors, or None if unknown."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        files = [{k: v for k, v in entry.items() if k != "path"} for entry in job["files"]]
+        done = [entry for entry in files if entry["status"] not in ("queued", "processing")]
+        processed_bytes = sum(entry.get("bytes", 0) for entry in done)
+        elapsed = None
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "progress": {"files_total": len(files), "files_done": len(done)},
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+                "files_per_second": round(len(done) / elapsed, 3) if elapsed else None,
+                "bytes_per_second": round(processed_bytes / elapsed, 1) if elapsed else None
+            },
+            "errors": [
+                {"filename": entry["filename"], "error": entry["error"]} for entry in files if entry.get("error")
+            ] + ([{"error": job["error"]}] if job["error"] else []),
+            "files": files
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+        resumed = job["status"] == "running"
+        files = job["files"]
+        self.store.update(job_id, status="running", started_at=job["started_at"] or time.time())
+
+        # Files still waiting (or interrupted by a restart) are processed; finished ones are kept
+        todo = [i for i, entry in enumerate(files) if entry["status"] in ("queued", "processing")]
+        for i in todo:
+            files[i]["status"] = "processing"
+        self.store.update(job_id, files=files)
+
+        def on_progress(index: int, result: Dict[str, Any]) -> None:
+            position = todo[index]
+            files[position] = {**result, "path": files[position].get("path")}
+            self.store.update(job_id, files=files)
+
+        try:
+            await self.process([files[i] for i in todo], resumed, on_progress)
+            self.store.update(job_id, status="completed", finished_at=time.time())
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so it is resumed on the next start
+            raise
+        except Exception as job_error:
+            logger.error(f"Ingestion job {job_id} failed: {job_error}", exc_info=True)
+            self.store.update(job_id, status="failed", finished_at=time.time(), error=str(job_error))
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
@@ -1,27 +1,45 @@
 import os
-import json
-import requests
+import httpx
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
-import weaviate
-from weaviate.classes.config import Property, DataType
-from typing import List, Dict, Any
+from weaviate.classes.data import DataObject
+from weaviate.util import generate_uuid5
+from typing import List, Dict, Any, Tuple, Optional, Union
+import uuid
 import datetime
-import traceback
+import asyncio
+import time
 
-# Custom JSON encoder to handle datetime objects
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-        return super().default(obj)
+# Load .env before importing local modules, which read their settings at import time
+load_dotenv()
 
-print("Starting FastAPI app...")
+from chunking import aiter_chunks
+from intake import StreamedFile, RequestBudget, UploadTooLarge
+from jobs import IngestQueue, QueueFull
+from extractors import ExtractionPool, ExtractionError, find_extractor
+from collection_registry import CollectionRegistry
+from collection_export import export_records, gzip_jsonl, object_record
+from health import HealthMonitor
+from vector_store import create_vector_store, insert_batched, WEAVIATE_BATCH_SIZE, WEAVIATE_BATCH_CONCURRENCY
+from bm25_index import BM25Index, BM25_INDEX_ENABLED
+from result_cache import CacheVersion, create_result_cache
+from semantic_cache import SemanticCache, StreamAccumulator, conversation_scope, latest_user_message
+from prompts import build_system_prompt, build_citations
+from context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+from mmr import candidate_count, diversify, default_lambda
+from serialization import FastJSONResponse, dumps, loads, ndjson_response
+from snippets import extract_snippets, truncate_utf8, SNIPPET_WINDOW, SNIPPET_SEPARATOR
+from structured_logging import get_logger
+from metrics import (
+    METRICS_DIR, publish_periodically, render_all, unpublish, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, STAGE_LATENCY, SEARCH_FALLBACKS,
+    INGEST_BYTES, INGEST_OBJECTS, EXTRACTION_LATENCY, CONTEXT_TOKENS
+)
 
-load_dotenv()
+logger = get_logger("api")
+
+logger.info("Starting FastAPI app")
 
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
@@ -29,7 +47,56 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 
-app = FastAPI()
+# DeepSeek HTTP client pool settings (timeouts in seconds)
+DEEPSEEK_MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20"))
+DEEPSEEK_MAX_KEEPALIVE = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE", "10"))
+DEEPSEEK_KEEPALIVE_EXPIRY = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "30"))
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "5"))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", "60"))
+DEEPSEEK_HTTP2 = os.getenv("DEEPSEEK_HTTP2", "true").lower() == "true"
+
+# Seconds a store search may take before the next fallback is tried
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "5"))
+# Results fetched per store query when /search streams NDJSON
+NDJSON_PAGE_SIZE = int(os.getenv("NDJSON_PAGE_SIZE", "50"))
+# Most results one /search or /rag request may ask for
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "1000"))
+# Largest page /documents returns
+DOCUMENTS_MAX_PAGE_SIZE = int(os.getenv("DOCUMENTS_MAX_PAGE_SIZE", "1000"))
+
+# Schema of the Document collection as (name, type) pairs
+DOCUMENT_PROPERTIES = [
+    ("filename", "text"),
+    ("content", "text"),
+    ("chunk_index", "int"),
+    ("offset", "int"),
+    ("uploaded_at", "date")
+]
+
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Storage engine (Weaviate or the in-memory store), created in startup_event
+store = None
+# Shared pooled HTTP client for DeepSeek, created in startup_event
+http_client = None
+# Cached Weaviate collection existence, configs and handles
+collection_registry = CollectionRegistry()
+# Data version shared by every worker, bumped whenever /upload writes objects
+cache_version = CacheVersion()
+# Search response cache, keyed on cache_version
+result_cache = create_result_cache(cache_version)
+# Opt-in /chat answer cache keyed on question similarity, cleared when cache_version changes
+semantic_cache = SemanticCache(version=cache_version)
+# Background ingestion queue behind /upload, created in startup_event
+ingest_queue = None
+# Process pool for CPU-bound text extraction, started on first use
+extraction_pool = ExtractionPool()
+# Local BM25 index over ingested chunks, searched when the store cannot answer
+keyword_index = BM25Index() if BM25_INDEX_ENABLED else None
+# Background store connectivity checks behind /readyz, started in startup_event
+health_monitor = None
+# Publishes this worker's metrics for /metrics to merge when METRICS_DIR is set
+metrics_publisher = None
 
 # Configure CORS
 app.add_middleware(
@@ -40,74 +107,158 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Track in-flight requests and per-route latency.
+
+    Routes are labelled by their path template (e.g. /jobs/{job_id}) so ids
+    don't explode the label set. Streaming responses are timed until their
+    headers are sent, not until the stream ends.
+    """
+    REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
 @app.on_event("startup")
 async def startup_event():
-    print("In startup_event")
-    print("WEAVIATE_URL:", os.getenv("WEAVIATE_URL"))
-    print("WEAVIATE_API_KEY:", os.getenv("WEAVIATE_API_KEY"))
-    global client
-    client = weaviate.connect_to_wcs(
-        cluster_url=WEAVIATE_URL,
-        auth_credentials=weaviate.AuthApiKey(api_key=WEAVIATE_API_KEY)
-    )
+    global store
+    store = create_vector_store(WEAVIATE_URL, WEAVIATE_API_KEY, collection_registry)
+    logger.info(f"Connecting to {type(store).__name__}", extra={"weaviate_url": WEAVIATE_URL})
+    await store.connect()
+
+    global health_monitor
+    health_monitor = HealthMonitor(store.ready)
+    await health_monitor.start()
+
+    global http_client
+    http_client = create_http_client()
+
+    global metrics_publisher
+    if METRICS_DIR:
+        metrics_publisher = asyncio.create_task(publish_periodically())
+
+    if keyword_index is not None:
+        keyword_index.load()
+
+    global ingest_queue
+    ingest_queue = IngestQueue(process_ingest_job)
 
     # Configure existing collections
     try:
-        configure_existing_collections()
+        await store.configure_collection("Document", DOCUMENT_PROPERTIES)
     except Exception as e:
-        print(f"Error configuring existing collections: {e}")
-        traceback.print_exc()
+        logger.error(f"Error configuring existing collections: {e}", exc_info=True)
+
+    # Start ingestion workers only once collections are configured
+    await ingest_queue.start()
 
-def configure_existing_collections():
-    """Configure existing collections with proper vectorizer settings."""
-    print("Checking and configuring existing collections...")
-    collections = client.collections.list_all()
-    print(f"Found collections: {collections}")
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Shutting down")
+    if health_monitor is not None:
+        await health_monitor.stop()
+    if metrics_publisher is not None:
+        metrics_publisher.cancel()
+        await asyncio.gather(metrics_publisher, return_exceptions=True)
+        unpublish()
+    if ingest_queue is not None:
+        await ingest_queue.stop()
+        logger.info("Ingestion workers stopped")
+    extraction_pool.shutdown()
+    if keyword_index is not None:
+        keyword_index.close()
+    if store is not None:
+        await store.close()
+        logger.info("Vector store closed")
+    if http_client is not None:
+        await http_client.aclose()
+        logger.info("DeepSeek HTTP client closed")
 
-    if "Document" in collections:
-        print("Configuring Document collection...")
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared keep-alive HTTP client used for DeepSeek calls.
+
+    HTTP/2 is only enabled when requested and the optional h2 package is installed.
+    """
+    http2 = DEEPSEEK_HTTP2
+    if http2:
         try:
-            # Get the collection
-            collection = client.collections.get("Document")
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("h2 package not installed, DeepSeek client falls back to HTTP/1.1")
+            http2 = False
 
-            # Check if vectorizer is configured
-            config = collection.config.get()
-            print(f"Current collection config: {config}")
+    return httpx.AsyncClient(
+        base_url=DEEPSEEK_API_BASE,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=DEEPSEEK_MAX_KEEPALIVE,
+            keepalive_expiry=DEEPSEEK_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            DEEPSEEK_READ_TIMEOUT,
+            connect=DEEPSEEK_CONNECT_TIMEOUT
+        )
+    )
 
-            # Update vectorizer if needed
-            if not config.vectorizer or config.vectorizer == "none":
-                print("Setting vectorizer for Document collection...")
-                try:
-                    collection.config.update_vectorizer(
-                        vectorizer=weaviate.classes.config.Configure.Vectorizer.text2vec_transformers()
-                    )
-                    print("Vectorizer updated successfully")
-                except Exception as vectorizer_error:
-                    print(f"Error updating vectorizer: {vectorizer_error}")
-
-                    # Try alternative vectorizer
-                    try:
-                        print("Trying alternative vectorizer...")
-                        collection.config.update_vectorizer(
-                            vectorizer=weaviate.classes.config.Configure.Vectorizer.none()
-                        )
-                        print("Set to 'none' vectorizer successfully")
-                    except Exception as alt_error:
-                        print(f"Error setting alternative vectorizer: {alt_error}")
-        except Exception as e:
-            print(f"Error configuring Document collection: {e}")
-            traceback.print_exc()
-    else:
-        print("Document collection does not exist, will be created when files are uploaded")
+def chunk_uuid(content_hash: str, chunk_index: int) -> str:
+    """Deterministic object id for a chunk of a file with the given content hash."""
+    return generate_uuid5(f"{content_hash}:{chunk_index}")
+
+async def insert_objects(collection, objects: List[Any]) -> Dict[int, str]:
+    """Insert objects with insert_many in fixed-size batches.
+
+    Batches are sent concurrently (up to WEAVIATE_BATCH_CONCURRENCY at a time).
+    Returns a mapping of object index to error message for every failed object.
+    """
+    return await insert_batched(collection, objects, WEAVIATE_BATCH_SIZE, WEAVIATE_BATCH_CONCURRENCY)
+
+@app.get("/livez")
+async def livez():
+    """Liveness probe: answers from the process alone, without touching the store."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: reports the background connectivity check instead of running one."""
+    if health_monitor is None:
+        return FastJSONResponse({"status": "starting"}, status_code=503)
+    status = health_monitor.status()
+    return FastJSONResponse(
+        {"status": "ready" if status["ready"] else "unavailable", **status},
+        status_code=200 if status["ready"] else 503
+    )
 
 @app.get("/ping")
-def ping():
+async def ping():
     try:
-        meta = client.get_meta()
+        meta = await store.meta()
         return {"status": "ok", "meta": meta}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, stage and ingestion metrics, for every worker."""
+    return PlainTextResponse(render_all(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"search": await result_cache.stats(), "chat": semantic_cache.stats()}
+
 @app.get("/debug/env")
 def debug_env():
     # Return masked environment variables for debugging
@@ -119,260 +270,850 @@ def debug_env():
         "WEAVIATE_API_KEY_SET": bool(WEAVIATE_API_KEY)
     }
 
-@app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
-    try:
-        print("Upload endpoint called with files:", [f.filename for f in files])
-        results = []
-        # Ensure Document class exists
-        class_name = "Document"
+async def ensure_document_collection():
+    """Create the Document collection if it does not exist yet and return its handle."""
+    class_name = "Document"
+    collection = await store.get_collection(class_name)
+    if collection is None:
+        collection = await store.create_collection(class_name, DOCUMENT_PROPERTIES)
+        logger.info(f"Collection {class_name} created successfully")
+    return collection
+
+async def ingest_files(collection, files, check_duplicates: bool = True, on_progress=None) -> List[Dict[str, Any]]:
+    """Stream, chunk and insert uploaded files, returning one result per file.
+
+    check_duplicates=False skips the "already stored" lookup, which is used
+    when resuming a job whose files may have been partially inserted.
+    on_progress, if given, is called with (file_index, result) as files finish.
+
+    A file's chunk 0 marks it as stored, so it is held back and only written
+    once every other chunk of the file has been. A file that fails part way
+    is then not mistaken for a duplicate, and uploading it again re-upserts
+    the same deterministic ids.
+    """
+    results = []
+    # Stream each file through chunking and write chunks in bounded batches
+    pending = []
+    inserted = 0
+    flush_size = max(1, WEAVIATE_BATCH_SIZE) * max(1, WEAVIATE_BATCH_CONCURRENCY)
+    markers: Dict[int, Any] = {}  # Held-back chunk 0 of each file, by result index
+    unflushed: Dict[int, int] = {}  # Chunks of each file queued but not yet written
+    chunked = set()  # Files whose text has been fully chunked
+
+    def release_markers():
+        for result_index in [i for i in markers if i in chunked and not unflushed.get(i)]:
+            marker = markers.pop(result_index)
+            if results[result_index]["status"] != "error":
+                pending.append((result_index, marker))
+                unflushed[result_index] = 1
+
+    async def flush():
+        nonlocal pending, inserted
+        if not pending:
+            return
+        batch, pending = pending, []
+        logger.debug("Inserting %d chunks into Weaviate", len(batch))
+        errors = await insert_objects(collection, [obj for _, obj in batch])
+        for result_index, _ in batch:
+            unflushed[result_index] -= 1
+        for index, message in sorted(errors.items()):
+            result_index = batch[index][0]
+            logger.warning("Error inserting chunk of %s: %s", results[result_index]["filename"], message)
+            if results[result_index]["status"] != "error":
+                results[result_index]["status"] = "error"
+                results[result_index]["error"] = message
+        inserted += len(batch) - len(errors)
+        if keyword_index is not None:
+            # Only index what the store accepted, so both stay in sync
+            keyword_index.add_many(
+                (str(obj.uuid), obj.properties) for i, (_, obj) in enumerate(batch) if i not in errors
+            )
+        INGEST_OBJECTS.inc(len(batch) - len(errors), outcome="inserted")
+        if errors:
+            INGEST_OBJECTS.inc(len(errors), outcome="failed")
+        release_markers()
+
+    budget = RequestBudget()
+    seen_hashes = set()
+    for file in files:
+        filename = file.filename
+        uploaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        results.append({"filename": filename, "status": "uploaded", "chunks": 0})
+        result_index = len(results) - 1
         try:
-            collections = client.collections.list_all()
-            print("Available collections:", collections)
-
-            if class_name not in collections:
-                print(f"Creating collection {class_name}")
-                # Define properties using the Property class with DataType enum
-                properties = [
-                    Property(name="filename", data_type=DataType.TEXT),
-                    Property(name="content", data_type=DataType.TEXT),
-                    Property(name="uploaded_at", data_type=DataType.DATE)
-                ]
-
-                # Create the collection with the proper property format and vectorizer
+            streamed = StreamedFile(file, budget)
+            streamed.check_declared_size()
+            logger.debug("Processing file: %s", filename)
+
+            # Object ids derive from the content hash, so identical content
+            # is recognised from its first chunk (written last) and skipped
+            content_hash = await streamed.sha256()
+            results[result_index]["sha256"] = content_hash
+            if content_hash in seen_hashes or (
+                check_duplicates and await collection.exists(chunk_uuid(content_hash, 0))
+            ):
+                logger.info("Skipping duplicate file: %s", filename)
+                results[result_index]["status"] = "duplicate"
+                continue
+            seen_hashes.add(content_hash)
+
+            # Parse rich formats (PDF, DOCX, HTML) in the process pool;
+            # everything else is decoded as UTF-8 while streaming
+            extractor = find_extractor(filename, file.content_type)
+            if extractor is not None:
+                path, is_temp = await streamed.to_path()
                 try:
-                    print("Creating collection with text2vec_transformers vectorizer...")
-                    client.collections.create(
-                        name=class_name,
-                        properties=properties,
-                        vectorizer_config=weaviate.classes.config.Configure.Vectorizer.text2vec_transformers()
-                    )
-                    print("Collection created successfully with text2vec_transformers")
-                except Exception as vectorizer_error:
-                    print(f"Error creating collection with text2vec_transformers: {vectorizer_error}")
-
-                    # Try with a different vectorizer
-                    try:
-                        print("Creating collection with 'none' vectorizer...")
-                        client.collections.create(
-                            name=class_name,
-                            properties=properties,
-                            vectorizer_config=weaviate.classes.config.Configure.Vectorizer.none()
-                        )
-                        print("Collection created successfully with 'none' vectorizer")
-                    except Exception as none_error:
-                        print(f"Error creating collection with 'none' vectorizer: {none_error}")
-                        raise
-                print(f"Collection {class_name} created successfully")
-        except Exception as collection_error:
-            print(f"Error creating/checking collection: {collection_error}")
-            traceback.print_exc()
-            return JSONResponse({"error": f"Collection error: {str(collection_error)}"}, status_code=500)
-
-        for file in files:
+                    started = time.perf_counter()
+                    text = await extraction_pool.extract(extractor, path)
+                    extract_seconds = time.perf_counter() - started
+                    EXTRACTION_LATENCY.observe(extract_seconds)
+                    results[result_index]["extract_seconds"] = round(extract_seconds, 3)
+                    file_bytes = os.path.getsize(path)
+                finally:
+                    if is_temp:
+                        os.remove(path)
+            else:
+                text = streamed.text()
+
+            # Split the text into passages, one Weaviate object per chunk
+            async for chunk_index, offset, chunk in aiter_chunks(text):
+                obj = DataObject(
+                    properties={
+                        "filename": filename,
+                        "content": chunk,
+                        "chunk_index": chunk_index,
+                        "offset": offset,
+                        "uploaded_at": uploaded_at
+                    },
+                    uuid=chunk_uuid(content_hash, chunk_index)
+                )
+                results[result_index]["chunks"] += 1
+                if chunk_index == 0:
+                    markers[result_index] = obj
+                    continue
+                pending.append((result_index, obj))
+                unflushed[result_index] = unflushed.get(result_index, 0) + 1
+                if len(pending) >= flush_size:
+                    await flush()
+            chunked.add(result_index)
+            release_markers()
+            results[result_index]["bytes"] = file_bytes if extractor is not None else streamed.bytes_read
+            INGEST_BYTES.inc(results[result_index]["bytes"])
+        except Exception as file_error:
+            logger.warning(f"Error processing file {filename}: {file_error}",
+                           exc_info=not isinstance(file_error, (UploadTooLarge, ExtractionError)))
+            results[result_index]["status"] = "error"
+            results[result_index]["error"] = str(file_error)
+        if on_progress:
+            on_progress(result_index, results[result_index])
+
+    # Markers are released by the flush that writes their file's last chunks
+    while pending:
+        await flush()
+    if on_progress:
+        # Insert errors from the final flush may have changed earlier results
+        for result_index, result in enumerate(results):
+            on_progress(result_index, result)
+    logger.info("Inserted %d objects", inserted, extra={"objects": inserted})
+    if inserted:
+        await result_cache.invalidate()
+        semantic_cache.invalidate()
+
+    return results
+
+@app.post("/upload")
+async def upload_files(files: List[UploadFile] = File(...), wait: bool = False):
+    try:
+        logger.info("Upload of %d files", len(files))
+
+        # Process inline when the caller asks to wait for the results
+        if wait:
             try:
-                raw = await file.read()
-                filename = file.filename
-                uploaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
-                print(f"Processing file: {filename}, size: {len(raw)} bytes")
+                collection = await ensure_document_collection()
+            except Exception as collection_error:
+                logger.error(f"Error creating/checking collection: {collection_error}", exc_info=True)
+                return FastJSONResponse({"error": f"Collection error: {str(collection_error)}"}, status_code=500)
+            results = await ingest_files(collection, files)
+            return FastJSONResponse({"results": results})
 
-                # Extract plain text from file
-                try:
-                    # Simple text extraction based on file extension
-                    if filename.lower().endswith('.txt'):
-                        text = raw.decode(errors="ignore")
-                    else:
-                        # For other file types, just use the raw content as text
-                        text = raw.decode(errors="ignore")
-                except Exception as text_error:
-                    print(f"Text extraction error for {filename}: {text_error}")
-                    text = "[Unable to extract text from this file]"
-
-                # Prepare object for Weaviate
-                obj = {
-                    "filename": filename,
-                    "content": text,
-                    "uploaded_at": uploaded_at
-                }
+        # Otherwise spool the files, queue a job and return its id right away
+        try:
+            job = await ingest_queue.submit(files)
+        except QueueFull as queue_error:
+            return FastJSONResponse({"error": str(queue_error)}, status_code=503, headers={"Retry-After": "5"})
+        return FastJSONResponse(job, status_code=202)
+    except Exception as e:
+        logger.error(f"Upload error: {e}", exc_info=True)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = ingest_queue.status(job_id)
+    if job is None:
+        return FastJSONResponse({"error": "Job not found"}, status_code=404)
+    return FastJSONResponse(job)
 
-                # Insert into Weaviate
-                print(f"Inserting {filename} into Weaviate")
-                collection = client.collections.get("Document")
-                collection.data.insert(obj)
-                print(f"Successfully inserted {filename}")
+def parse_fields(fields: Union[None, str, List[str]]) -> Optional[List[str]]:
+    """Turn fields, a list or a comma-separated string, into a property list (None means all).
 
-                results.append({"filename": filename, "status": "uploaded"})
-            except Exception as file_error:
-                print(f"Error processing file {file.filename}: {file_error}")
-                traceback.print_exc()
-                results.append({"filename": file.filename, "status": "error", "error": str(file_error)})
+    Raises ValueError for anything that is not a Document property name.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    elif fields is not None and not (isinstance(fields, list) and all(isinstance(name, str) for name in fields)):
+        raise ValueError("fields must be a list of property names or a comma-separated string")
+    names = [name.strip() for name in fields or [] if name.strip()]
+    known = [name for name, _ in DOCUMENT_PROPERTIES]
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (expected {', '.join(known)})")
+    return names or None
 
-        return JSONResponse({"results": results})
+def parse_int(value: Any, name: str, minimum: int = 0) -> int:
+    """Read an integer request parameter (a number or numeric string).
+
+    Raises ValueError if it is not a whole number of at least minimum.
+    """
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+def parse_lambda(value: Any) -> Optional[float]:
+    """Read the MMR lambda parameter: None (no diversification) or a number from 0 to 1.
+
+    Raises ValueError for anything else.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError("lambda must be between 0 and 1")
+    return float(value)
+
+@app.get("/documents")
+async def list_documents(
+    after: Optional[str] = None, limit: int = 100, fields: Optional[str] = None, include_vector: bool = False
+):
+    """List Document objects in id order, one page per call.
+
+    Pass the returned next_cursor as after to get the following page; it is
+    null once the last page has been returned.
+    """
+    try:
+        try:
+            return_properties = parse_fields(fields)
+        except ValueError as field_error:
+            return FastJSONResponse({"error": str(field_error)}, status_code=400)
+        if after is not None:
+            try:
+                after = str(uuid.UUID(after))
+            except ValueError:
+                return FastJSONResponse({"error": "after must be a document id (a UUID)"}, status_code=400)
+        collection = await find_document_collection()
+        if collection is None:
+            return FastJSONResponse({"error": "Document collection does not exist"}, status_code=404)
+        limit = max(1, min(limit, DOCUMENTS_MAX_PAGE_SIZE))
+        hits = await collection.list_objects(
+            after=after, limit=limit, return_properties=return_properties, include_vector=include_vector
+        )
+        return FastJSONResponse({
+            "documents": [object_record(hit, include_vector) for hit in hits],
+            "next_cursor": hits[-1].uuid if len(hits) == limit else None
+        })
     except Exception as e:
-        print("UPLOAD ERROR:", e)
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        logger.error(f"Document listing error: {e}", exc_info=True)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/documents/export")
+async def export_documents(fields: Optional[str] = None, include_vector: bool = False):
+    """Stream the whole Document collection as gzip-compressed JSON lines, one object per line."""
+    try:
+        return_properties = parse_fields(fields)
+    except ValueError as field_error:
+        return FastJSONResponse({"error": str(field_error)}, status_code=400)
+    collection = await find_document_collection()
+    if collection is None:
+        return FastJSONResponse({"error": "Document collection does not exist"}, status_code=404)
+    return StreamingResponse(
+        gzip_jsonl(export_records(collection, include_vector, return_properties)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="documents.jsonl.gz"'}
+    )
+
+async def process_ingest_job(entries: List[Dict[str, Any]], resumed: bool, on_progress):
+    """Ingest the spooled files of a queued job (run by the IngestQueue workers)."""
+    collection = await ensure_document_collection()
+    uploads = [
+        UploadFile(file=open(entry["path"], "rb"), filename=entry["filename"], size=os.path.getsize(entry["path"]))
+        for entry in entries
+    ]
+    try:
+        await ingest_files(collection, uploads, check_duplicates=not resumed, on_progress=on_progress)
+    finally:
+        for upload in uploads:
+            upload.file.close()
 
 @app.post("/search")
-async def search_documents(query: dict):
+async def search_documents(query: dict, request: Request):
+    """Search uploaded chunks.
+
+    Results are returned as one JSON object, or as NDJSON (one result per
+    line) when the body sets "stream" or the client accepts
+    application/x-ndjson. Streamed results are fetched NDJSON_PAGE_SIZE at a
+    time, so the first lines go out before later pages have been fetched.
+    """
     try:
         # Get the query string from the request body
         query_text = query.get("query", "")
-        print(f"\n\n=== SEARCH REQUEST ===\nQuery: {query_text}")
+        group_by_file = bool(query.get("group_by_file", False))
+        if not isinstance(query_text, str):
+            return FastJSONResponse({"error": "query must be a string"}, status_code=400)
+        try:
+            limit = min(parse_int(query.get("limit", 5), "limit", minimum=1), SEARCH_MAX_LIMIT)
+            mmr_lambda = parse_lambda(query.get("lambda", default_lambda()))
+            fields = parse_fields(query.get("fields"))
+            snippet_window = parse_int(query.get("snippet_window", SNIPPET_WINDOW), "snippet_window", minimum=1)
+            max_bytes = query.get("max_bytes")
+            if max_bytes is not None:
+                max_bytes = parse_int(max_bytes, "max_bytes")
+        except ValueError as parameter_error:
+            return FastJSONResponse({"error": str(parameter_error)}, status_code=400)
+        snippets = bool(query.get("snippets", False))
+        stream = bool(query.get("stream")) or "application/x-ndjson" in request.headers.get("accept", "")
+        if fields is not None:
+            if group_by_file:
+                # Grouping needs to know which file and position each chunk came from
+                fields += [name for name in ("filename", "chunk_index") if name not in fields]
+        logger.debug("Search request", extra={"query": query_text})
 
         if not query_text:
-            print("Error: Query is empty")
-            return JSONResponse({"error": "Query is required"}, status_code=400)
+            return FastJSONResponse({"error": "Query is required"}, status_code=400)
 
-        # Check if Document collection exists
-        collections = client.collections.list_all()
-        print(f"Available collections: {collections}")
+        def shape(results: List[Dict[str, Any]], group: bool) -> List[Dict[str, Any]]:
+            # Replace full chunk bodies with windows around the matched terms
+            if snippets:
+                for result in results:
+                    if "content" in result:
+                        result["content"] = SNIPPET_SEPARATOR.join(
+                            extract_snippets(result["content"], query_text, snippet_window)
+                        )
 
-        if "Document" not in collections:
-            print("Error: Document collection does not exist")
-            return JSONResponse({"error": "Document collection does not exist"}, status_code=500)
+            if group:
+                results = group_results_by_file(results)
 
-        # Get collection info
-        collection = client.collections.get("Document")
-        config = collection.config.get()
-        print(f"Collection config: {config}")
+            # Cap the size of each result's content
+            if max_bytes is not None:
+                for result in results:
+                    if "content" in result:
+                        result["content"] = truncate_utf8(result["content"], max_bytes)
+            return results
 
-        # Check if there are any objects in the collection
-        try:
-            count = collection.query.fetch_objects(limit=1)
-            print(f"Collection has objects: {len(count.objects) > 0}")
-            if len(count.objects) > 0:
-                print(f"Sample object: {count.objects[0].properties}")
-        except Exception as count_error:
-            print(f"Error counting objects: {count_error}")
+        # Serve repeated queries from the result cache (streamed searches bypass it)
+        use_cache = bool(query.get("cache", True)) and not stream
+        if use_cache:
+            cache_key = await result_cache.make_key(query_text, {
+                "group_by_file": group_by_file,
+                "limit": limit,
+                "fields": fields,
+                "snippets": snippets,
+                "snippet_window": snippet_window,
+                "max_bytes": max_bytes,
+                "lambda": mmr_lambda
+            })
+            cached = await result_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Serving search results from cache")
+                return FastJSONResponse(cached)
 
-        # Try different search methods
-        results = None
+        # Look up the cached Document collection handle
+        collection = await find_document_collection()
+        if collection is None and not local_index_available():
+            logger.warning("Search failed: Document collection does not exist")
+            return FastJSONResponse({"error": "Document collection does not exist"}, status_code=500)
 
+        if stream:
+            # Grouping and MMR need the whole result set, so they are fetched in one page
+            page_size = limit if group_by_file or mmr_lambda is not None else max(1, min(limit, NDJSON_PAGE_SIZE))
+            # Fetch the first page before responding, so a failed search still gets a 500
+            first_page, _ = await retrieve_documents(collection, query_text, page_size, fields, mmr_lambda)
+            return ndjson_response(stream_search_pages(
+                lambda offset, size: retrieve_documents(collection, query_text, size, fields, mmr_lambda, offset),
+                first_page, page_size, limit, lambda page: shape(page, group_by_file)
+            ))
+
+        formatted_results, ranked = await retrieve_documents(collection, query_text, limit, fields, mmr_lambda)
+        # Arbitrary fallback objects are not a real answer to this query, so don't cache them
+        use_cache = use_cache and ranked
+        formatted_results = shape(formatted_results, group_by_file)
+
+        logger.debug("Returning %d formatted results", len(formatted_results))
+        with STAGE_LATENCY.time(stage="serialization"):
+            response = FastJSONResponse({"results": formatted_results})
+        if use_cache:
+            await result_cache.set(cache_key, {"results": formatted_results})
+        return response
+    except Exception as e:
+        logger.error(f"Search error: {e}", exc_info=True)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
+
+async def stream_search_pages(fetch_page, first_page, page_size: int, limit: int, shape):
+    """Yield shaped results page by page, fetching each next page while the current one is sent.
+
+    fetch_page(offset, size) returns (results, ranked) like retrieve_documents.
+    Paging stops at limit results or at the first short page. A failure after
+    the first page ends the stream with an {"error": ...} line.
+    """
+    page, offset, next_page = first_page, 0, None
+    try:
+        while True:
+            requested = min(page_size, limit - offset)
+            offset += len(page)
+            if len(page) >= requested and offset < limit:
+                next_page = asyncio.ensure_future(fetch_page(offset, min(page_size, limit - offset)))
+            for result in shape(page):
+                yield result
+            if next_page is None:
+                return
+            try:
+                page, _ = await next_page
+            except Exception as page_error:
+                logger.warning(f"Streamed search stopped at offset {offset}: {page_error}")
+                yield {"error": str(page_error)}
+                return
+            next_page = None
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+def local_index_available() -> bool:
+    if keyword_index is None:
+        return False
+    # Other workers may have indexed uploads this one has not seen yet
+    keyword_index.refresh()
+    return len(keyword_index) > 0
+
+async def find_document_collection():
+    """Return the Document collection handle, or None if it is missing or the store is unreachable."""
+    try:
+        with STAGE_LATENCY.time(stage="schema_check"):
+            return await store.get_collection("Document")
+    except Exception as schema_error:
+        logger.warning(f"Document collection lookup failed: {schema_error}")
+        return None
+
+async def retrieve_documents(
+    collection,
+    query_text: str,
+    limit: int = 5,
+    return_properties: Optional[List[str]] = None,
+    mmr_lambda: Optional[float] = None,
+    offset: int = 0
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run the hybrid -> BM25 -> local BM25 -> fetch search chain and format the hits.
+
+    Each store search gets SEARCH_TIMEOUT seconds. A timed-out hybrid search
+    skips the store's BM25 and goes straight to the local index, as does a
+    collection of None (store unreachable). return_properties limits both
+    what is fetched and the keys of each result. Scores and distances, when
+    the search produces them, are returned under "metadata". With mmr_lambda,
+    candidate_count(limit) ranked hits are fetched (with their vectors) and
+    limit of them re-selected by maximal marginal relevance.
+    offset skips that many hits, for reading long result lists in pages.
+    Returns the formatted results and whether they were actually ranked
+    against the query (False when only the fetch fallback worked).
+    """
+    # Try different search methods
+    results = None
+    ranked = True
+    timed_out = False
+    diversifying = mmr_lambda is not None
+    candidate_limit = candidate_count(limit) if diversifying else limit
+
+    if collection is not None:
         # Try using hybrid search first (combines vector and keyword search)
         try:
-            print("Attempting hybrid search...")
-            results = collection.query.hybrid(
-                query=query_text,
-                alpha=0.5,  # Balance between vector and keyword search
-                limit=5
-            )
-            print("Hybrid search successful")
+            with STAGE_LATENCY.time(stage="hybrid"):
+                results = await asyncio.wait_for(collection.hybrid(
+                    query_text,
+                    limit=candidate_limit,
+                    alpha=0.5,  # Balance between vector and keyword search
+                    return_properties=return_properties,
+                    include_vector=diversifying,
+                    offset=offset
+                ), SEARCH_TIMEOUT)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Hybrid search timed out after {SEARCH_TIMEOUT} seconds")
         except Exception as hybrid_error:
-            print(f"Hybrid search failed: {hybrid_error}")
+            logger.warning(f"Hybrid search failed: {hybrid_error}")
 
-            # Try using BM25 search if hybrid search fails
+        # Try using BM25 search if hybrid search fails for a reason other than a slow store
+        if results is None and not timed_out:
             try:
-                print("Attempting BM25 search...")
-                results = collection.query.bm25(
-                    query=query_text,
-                    query_properties=["content"],
-                    limit=5
-                )
-                print("BM25 search successful")
+                SEARCH_FALLBACKS.inc(method="bm25")
+                with STAGE_LATENCY.time(stage="bm25"):
+                    results = await asyncio.wait_for(collection.bm25(
+                        query_text,
+                        limit=candidate_limit,
+                        query_properties=["content"],
+                        return_properties=return_properties,
+                        include_vector=diversifying,
+                        offset=offset
+                    ), SEARCH_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"BM25 search timed out after {SEARCH_TIMEOUT} seconds")
             except Exception as bm25_error:
-                print(f"BM25 search failed: {bm25_error}")
+                logger.warning(f"BM25 search failed: {bm25_error}")
 
-                # Try using get_all as a last resort
-                try:
-                    print("Attempting to get all objects...")
-                    results = collection.query.fetch_objects(limit=5)
-                    print("Get all objects successful")
-                except Exception as get_error:
-                    print(f"Get all objects failed: {get_error}")
-                    raise Exception("All search methods failed")
-
-        # Format the results
-        formatted_results = []
-        if results and hasattr(results, 'objects') and results.objects:
-            print(f"Found {len(results.objects)} results")
-            for obj in results.objects:
-                try:
-                    # Check if the object has the required properties
-                    if not hasattr(obj, 'properties'):
-                        print(f"Object has no properties: {obj}")
-                        continue
-
-                    # Get the properties safely
-                    props = obj.properties
-                    filename = props.get("filename", "Unknown filename")
-                    content = props.get("content", "No content available")
-
-                    # Handle uploaded_at datetime properly
-                    uploaded_at = props.get("uploaded_at")
-                    if uploaded_at is None:
-                        uploaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
-                    elif isinstance(uploaded_at, datetime.datetime):
-                        uploaded_at = uploaded_at.isoformat()
-                    elif not isinstance(uploaded_at, str):
-                        uploaded_at = str(uploaded_at)
-
-                    formatted_results.append({
-                        "filename": filename,
-                        "content": content,
-                        "uploaded_at": uploaded_at
-                    })
-                    print(f"Added result: {filename}")
-                except Exception as format_error:
-                    print(f"Error formatting result: {format_error}")
-                    traceback.print_exc()
-        else:
-            print("No results found or results object is invalid")
-
-        print(f"Returning {len(formatted_results)} formatted results")
-        # Use the custom JSON encoder to handle datetime objects
-        json_compatible_results = json.dumps({"results": formatted_results}, cls=CustomJSONEncoder)
-        return JSONResponse(content=json.loads(json_compatible_results))
-    except Exception as e:
-        print("SEARCH ERROR:", e)
-        traceback.print_exc()
-        error_json = json.dumps({"error": str(e)}, cls=CustomJSONEncoder)
-        return JSONResponse(content=json.loads(error_json), status_code=500)
+    # Rank against the local keyword index when the store could not
+    if results is None and local_index_available():
+        SEARCH_FALLBACKS.inc(method="local_bm25")
+        with STAGE_LATENCY.time(stage="local_bm25"):
+            results = keyword_index.search(query_text, candidate_limit, return_properties, offset)
+
+    # Try using get_all as a last resort
+    if results is None and collection is not None:
+        try:
+            SEARCH_FALLBACKS.inc(method="fetch")
+            with STAGE_LATENCY.time(stage="fetch"):
+                results = await collection.fetch(limit=limit, return_properties=return_properties, offset=offset)
+            ranked = False
+        except Exception as get_error:
+            logger.error(f"Get all objects failed: {get_error}")
+
+    if results is None:
+        raise Exception("All search methods failed")
+
+    # Drop near-duplicate passages in favour of the next most relevant distinct ones
+    if diversifying and ranked:
+        with STAGE_LATENCY.time(stage="mmr"):
+            results = diversify(results, limit, mmr_lambda)
+
+    # Format the results
+    formatted_results = []
+    if results:
+        logger.debug("Found %d results", len(results))
+        for hit in results:
+            try:
+                # Get the properties safely
+                props = hit.properties or {}
+                filename = props.get("filename", "Unknown filename")
+                content = props.get("content", "No content available")
+
+                # Handle uploaded_at datetime properly
+                uploaded_at = props.get("uploaded_at")
+                if uploaded_at is None:
+                    uploaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                elif isinstance(uploaded_at, datetime.datetime):
+                    uploaded_at = uploaded_at.isoformat()
+                elif not isinstance(uploaded_at, str):
+                    uploaded_at = str(uploaded_at)
+
+                result = {
+                    "filename": filename,
+                    "content": content,
+                    "chunk_index": props.get("chunk_index"),
+                    "offset": props.get("offset"),
+                    "uploaded_at": uploaded_at
+                }
+                if return_properties is not None:
+                    result = {key: value for key, value in result.items() if key in return_properties}
+
+                if hit.score is not None or hit.distance is not None:
+                    result["metadata"] = {"score": hit.score, "distance": hit.distance}
+
+                formatted_results.append(result)
+            except Exception as format_error:
+                logger.warning(f"Error formatting result: {format_error}", exc_info=True)
+    else:
+        logger.debug("No results found")
+
+    return formatted_results, ranked
+
+def group_results_by_file(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group chunk hits by filename, keeping files in order of their best hit.
+
+    Each group joins its chunks in document order into a single content field,
+    so grouped results keep the same shape as ungrouped ones.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for chunk in chunks:
+        group = groups.setdefault(chunk["filename"], {
+            "filename": chunk["filename"],
+            **({"uploaded_at": chunk["uploaded_at"]} if "uploaded_at" in chunk else {}),
+            "chunks": []
+        })
+        group["chunks"].append(chunk)
+
+    grouped = []
+    for group in groups.values():
+        group["chunks"].sort(key=lambda c: c["chunk_index"] if c.get("chunk_index") is not None else -1)
+        # A fields projection may have left content out entirely
+        if any("content" in c for c in group["chunks"]):
+            group["content"] = "\n...\n".join(c.get("content", "") for c in group["chunks"])
+            # The joined content is already on the group, so don't ship it twice
+            group["chunks"] = [{k: v for k, v in c.items() if k != "content"} for c in group["chunks"]]
+        grouped.append(group)
+    return grouped
 
 @app.post("/chat")
 async def chat_completion(request: Request):
     try:
-        # Print environment variables for debugging (masked for security)
-        print("DEEPSEEK_API_KEY set:", bool(DEEPSEEK_API_KEY))
-        print("DEEPSEEK_API_BASE:", DEEPSEEK_API_BASE)
-        print("DEEPSEEK_MODEL:", DEEPSEEK_MODEL)
 
         # Check if DeepSeek API key is configured
         if not DEEPSEEK_API_KEY:
-            print("ERROR: DeepSeek API key is not configured on the server")
-            return JSONResponse({"error": "DeepSeek API key is not configured on the server"}, status_code=500)
+            logger.error("DeepSeek API key is not configured on the server")
+            return FastJSONResponse({"error": "DeepSeek API key is not configured on the server"}, status_code=500)
 
         # Get the request body
         body = await request.json()
-        print("Chat request body:", json.dumps(body))
 
         # Forward the request to DeepSeek API
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        headers = deepseek_headers()
 
         # Set the model if not provided
         if "model" not in body:
             body["model"] = DEEPSEEK_MODEL
-            print("Using model:", body["model"])
+
+        # Answer near-duplicate questions without calling DeepSeek
+        question = latest_user_message(body) if semantic_cache.enabled else None
+        cache_scope = conversation_scope(body, body["model"]) if question else None
+        if question:
+            cached_entry = semantic_cache.lookup(question, cache_scope)
+            if cached_entry is not None:
+                logger.debug("Serving chat answer from semantic cache")
+                return cached_chat_response(cached_entry["answer"], body)
+
+        def remember_answer(answer: str, latency: float):
+            if question:
+                semantic_cache.store(question, cache_scope, answer, latency)
+
+        # Relay server-sent events as they arrive when streaming is requested
+        if body.get("stream"):
+            return await stream_chat_completion(body, headers, remember_answer if question else None)
 
         # Make the request to DeepSeek API
-        print(f"Sending request to {DEEPSEEK_API_BASE}/chat/completions")
-        response = requests.post(
-            f"{DEEPSEEK_API_BASE}/chat/completions",
+        started = time.perf_counter()
+        response = await http_client.post(
+            "/chat/completions",
             headers=headers,
-            json=body,
-            timeout=60
+            content=dumps(body)
+        )
+        latency = time.perf_counter() - started
+        STAGE_LATENCY.observe(latency, stage="deepseek")
+
+        logger.debug("DeepSeek API response status: %d", response.status_code)
+
+        # Relay DeepSeek's body as-is; it is only parsed when the answer needs caching
+        if response.status_code == 200 and question:
+            try:
+                remember_answer(loads(response.content)["choices"][0]["message"]["content"], latency)
+            except (KeyError, IndexError, TypeError, ValueError):
+                pass
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json")
+        )
+    except Exception as e:
+        logger.error(f"Chat error: {e}", exc_info=True)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
+
+def deepseek_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+async def stream_chat_completion(body: Dict[str, Any], headers: Dict[str, str], on_complete=None, prefix: bytes = b""):
+    """Open a streaming DeepSeek request and relay its SSE bytes without buffering.
+
+    Upstream errors are returned as a regular JSON response, since nothing has
+    been sent to the client yet at that point. If on_complete is given, it is
+    called with the full answer text and latency once the stream finishes.
+    prefix is sent to the client before the first upstream event.
+    """
+    accumulator = StreamAccumulator() if on_complete else None
+    upstream_request = http_client.build_request("POST", "/chat/completions", headers=headers, content=dumps(body))
+    # For streams the deepseek stage covers time to response headers
+    with STAGE_LATENCY.time(stage="deepseek"):
+        response = await http_client.send(upstream_request, stream=True)
+    logger.debug("DeepSeek API stream status: %d", response.status_code)
+
+    if response.status_code != 200:
+        try:
+            await response.aread()
+            try:
+                error_body = response.json()
+            except ValueError:
+                error_body = {"error": response.text}
+        finally:
+            await response.aclose()
+        return FastJSONResponse(error_body, status_code=response.status_code)
+
+    async def relay():
+        try:
+            if prefix:
+                yield prefix
+            async for chunk in response.aiter_bytes():
+                if accumulator:
+                    accumulator.feed(chunk)
+                yield chunk
+            if accumulator:
+                on_complete(accumulator.content, time.perf_counter() - accumulator.started)
+        except Exception as stream_error:
+            logger.warning(f"DeepSeek stream interrupted: {stream_error}")
+        finally:
+            await response.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def cached_chat_response(answer: str, body: Dict[str, Any], prefix: bytes = b""):
+    """Build a chat completion response (JSON or a one-event SSE stream) from a cached answer."""
+    if body.get("stream"):
+        chunk = {
+            "id": "semantic-cache",
+            "object": "chat.completion.chunk",
+            "model": body["model"],
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": answer}, "finish_reason": "stop"}]
+        }
+        events = b"data: " + dumps(chunk) + b"\n\ndata: [DONE]\n\n"
+        return StreamingResponse(
+            iter([prefix, events]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Cache": "semantic-hit"}
+        )
+    return FastJSONResponse({
+        "id": "semantic-cache",
+        "object": "chat.completion",
+        "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}]
+    }, headers={"X-Cache": "semantic-hit"})
+
+def citations_event(citations: List[Dict[str, Any]], context: Optional[Dict[str, int]] = None) -> bytes:
+    """Encode citations (and the context packing summary) as a named SSE event sent ahead of the streamed answer."""
+    payload: Dict[str, Any] = {"citations": citations}
+    if context is not None:
+        payload["context"] = context
+    return b"event: citations\ndata: " + dumps(payload) + b"\n\n"
+
+@app.post("/rag")
+async def rag_completion(request: Request):
+    """Retrieve relevant chunks, build the prompt and call DeepSeek in one request.
+
+    The body carries the conversation as "messages"; the retrieval query
+    defaults to the latest user message. Retrieved chunks are packed into
+    "context_tokens" (default CONTEXT_TOKEN_BUDGET, 0 for no limit) estimated
+    tokens before the prompt is built. Returns the answer with compact
+    citations and the packing summary, or streams them as SSE when "stream"
+    is true.
+    """
+    try:
+        if not DEEPSEEK_API_KEY:
+            logger.error("DeepSeek API key is not configured on the server")
+            return FastJSONResponse({"error": "DeepSeek API key is not configured on the server"}, status_code=500)
+
+        body = await request.json()
+        query_text = body.get("query") or latest_user_message(body)
+        if not query_text:
+            return FastJSONResponse({"error": "A user message or query is required"}, status_code=400)
+        model = body.get("model", DEEPSEEK_MODEL)
+        stream = bool(body.get("stream"))
+        try:
+            limit = min(parse_int(body.get("limit", 5), "limit", minimum=1), SEARCH_MAX_LIMIT)
+            mmr_lambda = parse_lambda(body.get("lambda", default_lambda()))
+            context_tokens = parse_int(body.get("context_tokens", CONTEXT_TOKEN_BUDGET), "context_tokens")
+        except ValueError as parameter_error:
+            return FastJSONResponse({"error": str(parameter_error)}, status_code=400)
+        # Earlier turns and retrieval settings change the answer, so they scope cache entries too
+        cache_scope = conversation_scope(
+            body, f"rag:{model}", limit=limit, mmr_lambda=mmr_lambda, context_tokens=context_tokens
         )
+        logger.debug("RAG request", extra={"query": query_text})
+
+        # Answer near-duplicate questions without retrieval or an LLM call
+        if semantic_cache.enabled:
+            cached_entry = semantic_cache.lookup(query_text, cache_scope)
+            if cached_entry is not None:
+                logger.debug("Serving RAG answer from semantic cache")
+                citations = cached_entry.get("citations", [])
+                if stream:
+                    return cached_chat_response(cached_entry["answer"], {"model": model, "stream": True}, citations_event(citations))
+                return FastJSONResponse({"answer": cached_entry["answer"], "citations": citations}, headers={"X-Cache": "semantic-hit"})
+
+        collection = await find_document_collection()
+        documents = []
+        retrieval_failed = False
+        if collection is not None or local_index_available():
+            try:
+                documents, _ = await retrieve_documents(collection, query_text, limit=limit, mmr_lambda=mmr_lambda)
+            except Exception as search_error:
+                # Answer without documents, as /chat does, rather than failing the request
+                logger.warning(f"RAG retrieval failed, answering without documents: {search_error}")
+                retrieval_failed = True
+        with STAGE_LATENCY.time(stage="context_pack"):
+            documents, context = pack_context(documents, context_tokens)
+        CONTEXT_TOKENS.observe(context["tokens_used"], outcome="used")
+        CONTEXT_TOKENS.observe(context["tokens_dropped"], outcome="dropped")
+        logger.debug("Packed RAG context", extra=context)
+        citations = build_citations(documents)
 
-        print("DeepSeek API response status:", response.status_code)
+        conversation = [m for m in body.get("messages") or [] if m.get("role") in ("user", "assistant")]
+        chat_body = {
+            "model": model,
+            "messages": [{"role": "system", "content": build_system_prompt(documents)}] + conversation,
+            "temperature": body.get("temperature", 0.7),
+            "max_tokens": body.get("max_tokens", 1000),
+            "stream": stream
+        }
+
+        def remember_answer(answer: str, latency: float):
+            # An answer given without documents because retrieval failed must not outlive the outage
+            if semantic_cache.enabled and not retrieval_failed:
+                semantic_cache.store(query_text, cache_scope, answer, latency, {"citations": citations})
+
+        if stream:
+            return await stream_chat_completion(chat_body, deepseek_headers(), remember_answer, citations_event(citations, context))
 
-        # Return the response from DeepSeek API
-        response_json = response.json()
-        print("DeepSeek API response:", json.dumps(response_json))
-        return JSONResponse(response_json, status_code=response.status_code)
+        started = time.perf_counter()
+        response = await http_client.post("/chat/completions", headers=deepseek_headers(), content=dumps(chat_body))
+        latency = time.perf_counter() - started
+        STAGE_LATENCY.observe(latency, stage="deepseek")
+        logger.debug("DeepSeek API response status: %d", response.status_code)
+
+        # Relay upstream errors as-is; they are not necessarily JSON
+        if response.status_code != 200:
+            return Response(
+                content=response.content,
+                status_code=response.status_code,
+                media_type=response.headers.get("content-type", "application/json")
+            )
+        response_json = loads(response.content)
+        answer = response_json["choices"][0]["message"]["content"]
+        remember_answer(answer, latency)
+        return FastJSONResponse({
+            "answer": answer,
+            "citations": citations,
+            "context": context,
+            "usage": response_json.get("usage")
+        })
     except Exception as e:
-        print("CHAT ERROR:", e)
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
\ No newline at end of file
+        logger.error(f"RAG error: {e}", exc_info=True)
+        return FastJSONResponse({"error": str(e)}, status_code=500)
@@ -0,0 +1,288 @@
+import os
+import json
+import uuid
+import datetime
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bm25_index import BM25Index, top_k
+from semantic_cache import HashingEmbedder
+from structured_logging import get_logger
+from vector_store import PropertySpec, SearchHit, StoreCollection, VectorStore
+
+# In-process vector store settings (used when VECTOR_STORE=memory)
+MEMORY_STORE_PATH = os.getenv("MEMORY_STORE_PATH", "vector_store")
+MEMORY_STORE_DIM = int(os.getenv("MEMORY_STORE_DIM", "1024"))
+MEMORY_STORE_CAPACITY = int(os.getenv("MEMORY_STORE_CAPACITY", "4096"))
+
+logger = get_logger("memory_store")
+
+
+def _jsonable(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+        for key, value in properties.items()
+    }
+
+
+class MemoryCollection(StoreCollection):
+    """One collection: a float32 embedding matrix plus a property list, indexed by row.
+
+    Embeddings live in a preallocated memory-mapped file that doubles in size
+    when full, so search is a single matrix-vector product over the filled
+    rows and the vectors survive restarts without a load step. Properties are
+    appended to a JSON lines log; the last record for an id wins on reload.
+    Objects without a vector are embedded locally with the HashingEmbedder.
+    Keyword scores come from an in-memory BM25Index rebuilt from the log.
+    """
+
+    def __init__(self, directory: str, name: str, properties: PropertySpec, dim: int, capacity: int, embedder):
+        self.name = name
+        self.dim = dim
+        self.schema = [list(prop) for prop in properties]
+        self.embedder = embedder
+        self._meta_path = os.path.join(directory, f"{name}.json")
+        self._vectors_path = os.path.join(directory, f"{name}.vectors")
+        self._log_path = os.path.join(directory, f"{name}.jsonl")
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._properties: List[Dict[str, Any]] = []
+        self.keywords = BM25Index(path=None)
+        self._keyword_rows = array("I")  # Row of each BM25Index document number
+        self._sorted_ids: Optional[List[str]] = None  # Cursor order, rebuilt after new ids arrive
+        self.count = 0
+
+        if not os.path.exists(self._vectors_path):
+            with open(self._vectors_path, "wb") as vectors_file:
+                vectors_file.truncate(max(1, capacity) * dim * 4)
+        self._open_vectors()
+        self._load_log()
+        self._write_meta()
+
+    @classmethod
+    def load(cls, directory: str, name: str, embedder) -> "MemoryCollection":
+        with open(os.path.join(directory, f"{name}.json")) as meta_file:
+            meta = json.load(meta_file)
+        return cls(directory, name, meta["properties"], meta["dim"], 0, embedder)
+
+    def _open_vectors(self) -> None:
+        capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2)
+        self._vectors.flush()
+        del self._vectors
+        with open(self._vectors_path, "r+b") as vectors_file:
+            vectors_file.truncate(new_capacity * self.dim * 4)
+        self._open_vectors()
+
+    def _load_log(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path) as log_file:
+            for line in log_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._set_row(record["row"], record["id"], record["properties"])
+
+    def _set_row(self, row: int, object_id: str, properties: Dict[str, Any]) -> None:
+        while len(self._ids) <= row:
+            self._ids.append("")
+            self._properties.append({})
+        if object_id not in self._rows:
+            self._sorted_ids = None
+        self._ids[row] = object_id
+        self._rows[object_id] = row
+        self._properties[row] = properties
+        self.keywords.add_many([(object_id, properties)])
+        self._keyword_rows.append(row)
+        self.count = len(self._ids)
+
+    def _write_meta(self) -> None:
+        with open(self._meta_path, "w") as meta_file:
+            json.dump({"name": self.name, "dim": self.dim, "properties": self.schema, "count": self.count}, meta_file)
+
+    def _embed(self, properties: Dict[str, Any]) -> np.ndarray:
+        text = properties.get("content")
+        if text is None:
+            text = " ".join(str(value) for value in properties.values() if isinstance(value, str))
+        return self.embedder.embed(text)
+
+    async def insert_many(self, objects: List[Any]) -> Dict[int, str]:
+        errors: Dict[int, str] = {}
+        records = []
+        for i, obj in enumerate(objects):
+            try:
+                properties = _jsonable(dict(getattr(obj, "properties", None) or {}))
+                object_id = str(getattr(obj, "uuid", None) or uuid.uuid4())
+                vector = getattr(obj, "vector", None)
+                if isinstance(vector, dict):
+                    vector = next(iter(vector.values()), None)
+                vector = self._embed(properties) if vector is None else np.asarray(vector, dtype=np.float32)
+                if vector.shape != (self.dim,):
+                    errors[i] = f"Vector has {vector.size} dimensions, expected {self.dim}"
+                    continue
+                norm = np.linalg.norm(vector)
+                row = self._rows.get(object_id, self.count)
+                self._ensure_capacity(row + 1)
+                self._vectors[row] = vector / norm if norm else vector
+                self._set_row(row, object_id, properties)
+                records.append(json.dumps({"id": object_id, "row": row, "properties": properties}))
+            except Exception as insert_error:
+                errors[i] = str(insert_error)
+
+        # Vectors are flushed before the log, so a logged row always has its vector
+        self._vectors.flush()
+        if records:
+            with open(self._log_path, "a") as log_file:
+                log_file.write("\n".join(records) + "\n")
+            self._write_meta()
+        return errors
+
+    async def exists(self, object_id: str) -> bool:
+        return str(object_id) in self._rows
+
+    async def property_spec(self) -> PropertySpec:
+        return [(prop_name, prop_type) for prop_name, prop_type in self.schema]
+
+    def _hit(self, row: int, return_properties, score=None, distance=None, include_vector=False) -> SearchHit:
+        properties = self._properties[row]
+        if return_properties is not None:
+            properties = {key: value for key, value in properties.items() if key in return_properties}
+        vector = np.array(self._vectors[row]) if include_vector else None
+        return SearchHit(self._ids[row], dict(properties), score, distance, vector)
+
+    def _vector_scores(self, vector) -> np.ndarray:
+        return self._vectors[:self.count] @ np.asarray(vector, dtype=np.float32)
+
+    def _keyword_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.count, dtype=np.float32)
+        numbers, matched = self.keywords.match(query)
+        scores[np.frombuffer(self._keyword_rows, dtype=np.uint32)[numbers]] = matched
+        return scores
+
+    async def hybrid(
+        self, query, limit=5, alpha=0.5, return_properties=None, include_vector=False, offset=0
+    ) -> List[SearchHit]:
+        if not self.count:
+            return []
+        # Min-max normalise both signals before fusing, like Weaviate's relative score fusion
+        fused = np.zeros(self.count, dtype=np.float32)
+        for weight, scores in ((alpha, self._vector_scores(self.embedder.embed(query))),
+                               (1 - alpha, self._keyword_scores(query))):
+            spread = scores.max() - scores.min()
+            if weight and spread > 0:
+                fused += weight * (scores - scores.min()) / spread
+        return [
+            self._hit(row, return_properties, score=float(fused[row]), include_vector=include_vector)
+            for row in top_k(fused, offset + limit)[offset:]
+        ]
+
+    async def bm25(
+        self, query, limit=5, query_properties=None, return_properties=None, include_vector=False, offset=0
+    ) -> List[SearchHit]:
+        scores = self._keyword_scores(query)
+        return [
+            self._hit(row, return_properties, score=float(scores[row]), include_vector=include_vector)
+            for row in top_k(scores, offset + limit)[offset:] if scores[row] > 0
+        ]
+
+    async def near_vector(self, vector, limit=5, return_properties=None) -> List[SearchHit]:
+        if not self.count:
+            return []
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        scores = self._vector_scores(vector / norm if norm else vector)
+        return [
+            self._hit(row, return_properties, distance=float(1 - scores[row])) for row in top_k(scores, limit)
+        ]
+
+    async def fetch(self, limit=5, return_properties=None, offset=0) -> List[SearchHit]:
+        return [self._hit(row, return_properties) for row in range(offset, min(offset + limit, self.count))]
+
+    async def list_objects(self, after=None, limit=100, return_properties=None, include_vector=False) -> List[SearchHit]:
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self._rows)
+        start = bisect_right(self._sorted_ids, after) if after else 0
+        return [
+            self._hit(self._rows[object_id], return_properties, include_vector=include_vector)
+            for object_id in self._sorted_ids[start:start + limit]
+        ]
+
+    def flush(self) -> None:
+        self._vectors.flush()
+        self._write_meta()
+
+
+class MemoryStore(VectorStore):
+    """In-process engine keeping every collection under MEMORY_STORE_PATH.
+
+    Suitable for tests and small single-instance deployments: queries are
+    brute force over all rows, and the files must not be shared between
+    processes that write to them.
+    """
+
+    def __init__(
+        self,
+        path: str = MEMORY_STORE_PATH,
+        dim: int = MEMORY_STORE_DIM,
+        capacity: int = MEMORY_STORE_CAPACITY,
+        embedder=None,
+    ):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.embedder = embedder or HashingEmbedder(dim)
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    async def connect(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        for filename in sorted(os.listdir(self.path)):
+            name, extension = os.path.splitext(filename)
+            if extension == ".json":
+                self._collections[name] = MemoryCollection.load(self.path, name, self.embedder)
+        logger.info(f"Memory store loaded: {sorted(self._collections)}", extra={"path": self.path})
+
+    async def close(self) -> None:
+        for collection in self._collections.values():
+            collection.flush()
+
+    async def meta(self) -> Dict[str, Any]:
+        return {
+            "engine": "memory",
+            "path": self.path,
+            "dim": self.dim,
+            "collections": {name: collection.count for name, collection in self._collections.items()}
+        }
+
+    async def ready(self) -> bool:
+        return True
+
+    async def get_collection(self, name: str) -> Optional[StoreCollection]:
+        return self._collections.get(name)
+
+    async def create_collection(self, name: str, properties: PropertySpec) -> StoreCollection:
+        if name not in self._collections:
+            logger.info(f"Creating collection {name}")
+            self._collections[name] = MemoryCollection(
+                self.path, name, properties, self.dim, self.capacity, self.embedder
+            )
+        return self._collections[name]
+
+    async def configure_collection(self, name: str, properties: PropertySpec) -> None:
+        collection = self._collections.get(name)
+        if collection is None:
+            return
+        known = {prop_name for prop_name, _ in collection.schema}
+        missing = [[prop_name, prop_type] for prop_name, prop_type in properties if prop_name not in known]
+        if missing:
+            collection.schema.extend(missing)
+            collection.flush()
@@ -0,0 +1,275 @@
+import os
+import time
+import json
+import uuid
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from processes import process_alive
+
+# Directory where each worker publishes its metric values for /metrics to merge ("" for one process)
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", "5"))
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+# Per-worker values of each metric, keyed by worker pid
+WorkerValues = Dict[str, Dict[LabelValues, Any]]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, *extra: Optional[Tuple[str, str]]) -> str:
+    pairs = list(zip(names, values))
+    pairs.extend(pair for pair in extra if pair)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self, values: Dict[LabelValues, Any], worker: Optional[Tuple[str, str]] = None) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key, worker)} {value}" for key, value in sorted(values.items())
+        ]
+
+    def render(self, workers: Optional[WorkerValues] = None) -> List[str]:
+        """Exposition lines for this process, or for each worker (labelled by pid) when given their values."""
+        if workers is None:
+            return self.header() + self.samples(self._values)
+        lines = self.header()
+        for worker, values in sorted(workers.items()):
+            lines.extend(self.samples(values, ("worker", worker)))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self, values: Dict[LabelValues, Any], worker: Optional[Tuple[str, str]] = None) -> List[str]:
+        return super().samples(values or ({(): 0.0} if not self.label_names else {}), worker)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last is +Inf)], sum, count
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the with-block takes, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: (list(counts), list(totals)) for key, (counts, totals) in self._values.items()}
+
+    def samples(self, values: Dict[LabelValues, Any], worker: Optional[Tuple[str, str]] = None) -> List[str]:
+        lines = []
+        for key, (counts, (total, count)) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, worker, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key, worker)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key, worker)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, Any]]:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, workers: Optional[Dict[str, Dict[str, Dict[LabelValues, Any]]]] = None) -> str:
+        """Render this process's metrics, or every worker's given {pid: snapshot()} of each."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            if workers is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render({worker: values.get(metric.name, {}) for worker, values in workers.items()}))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def publish(directory: str = METRICS_DIR) -> None:
+    """Write this worker's current values to directory for the other workers to read."""
+    os.makedirs(directory, exist_ok=True)
+    # JSON has no tuple keys, so each metric is stored as [[label values], value] pairs
+    snapshot = {
+        name: [[list(key), value] for key, value in values.items()] for name, values in REGISTRY.snapshot().items()
+    }
+    temporary = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+    with open(temporary, "w", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary, os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def unpublish(directory: str = METRICS_DIR) -> None:
+    _remove(os.path.join(directory, f"{os.getpid()}.json"))
+
+
+async def publish_periodically(directory: str = METRICS_DIR, interval: float = METRICS_PUBLISH_INTERVAL) -> None:
+    while True:
+        publish(directory)
+        await asyncio.sleep(interval)
+
+
+def render_all(directory: str = METRICS_DIR) -> str:
+    """Render metrics for /metrics.
+
+    With several workers behind one port, a scrape reaches whichever worker
+    accepts it, so each worker publishes its values to directory every
+    METRICS_PUBLISH_INTERVAL seconds and the answering worker renders all of
+    them with a worker="<pid>" label. Each series then only ever comes from
+    one process and never goes backwards between scrapes; sum by the other
+    labels for totals. Files of workers that have exited are removed.
+    Without a directory this process's metrics are rendered unlabelled.
+    """
+    if not directory:
+        return REGISTRY.render()
+    publish(directory)
+    workers: Dict[str, Dict[str, Dict[LabelValues, Any]]] = {}
+    for filename in os.listdir(directory):
+        pid, extension = os.path.splitext(filename)
+        if extension != ".json" or not pid.isdigit():
+            continue
+        path = os.path.join(directory, filename)
+        if not process_alive(int(pid)):
+            _remove(path)
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            workers[pid] = {
+                name: {tuple(key): value for key, value in values} for name, values in snapshot.items()
+            }
+        except (OSError, ValueError, TypeError):
+            continue
+    return REGISTRY.render(workers)
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "stage_duration_seconds",
+    "Latency of individual pipeline stages (schema_check, hybrid, bm25, local_bm25, fetch, mmr, context_pack, deepseek, serialization).",
+    ["stage"]
+))
+SEARCH_FALLBACKS = REGISTRY.register(Counter(
+    "search_fallbacks_total", "Searches that fell back from hybrid to a weaker method.", ["method"]
+))
+INGEST_BYTES = REGISTRY.register(Counter(
+    "ingest_bytes_total", "Bytes of uploaded files read during ingestion."
+))
+INGEST_OBJECTS = REGISTRY.register(Counter(
+    "ingest_objects_total", "Chunk objects written to the vector store.", ["outcome"]
+))
+CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "rag_context_tokens",
+    "Estimated tokens of retrieved context per /rag prompt, used or dropped to fit the budget.",
+    ["outcome"],
+    buckets=(0, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+))
+EXTRACTION_LATENCY = REGISTRY.register(Histogram(
+    "extraction_duration_seconds", "Time spent extracting text from rich documents."
+))
+EXTRACTIONS = REGISTRY.register(Counter(
+    "extractions_total", "Rich document extractions by outcome (ok, failed, timeout).", ["outcome"]
+))
@@ -0,0 +1,94 @@
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from semantic_cache import HashingEmbedder
+
+# Maximal marginal relevance settings (MMR_LAMBDA unset leaves results undiversified)
+MMR_LAMBDA = os.getenv("MMR_LAMBDA")
+MMR_CANDIDATE_FACTOR = int(os.getenv("MMR_CANDIDATE_FACTOR", "4"))
+# Most candidates re-ranked per search; the similarity matrix grows with its square
+MMR_MAX_CANDIDATES = int(os.getenv("MMR_MAX_CANDIDATES", "1000"))
+
+_content_embedder = HashingEmbedder()
+
+
+def default_lambda() -> Optional[float]:
+    return float(MMR_LAMBDA) if MMR_LAMBDA else None
+
+
+def candidate_count(limit: int) -> int:
+    """Candidates to fetch for limit diversified results: MMR_CANDIDATE_FACTOR times as many, up to MMR_MAX_CANDIDATES."""
+    return max(limit, min(limit * MMR_CANDIDATE_FACTOR, MMR_MAX_CANDIDATES))
+
+
+def relevance_scores(scores: Sequence[Optional[float]], distances: Sequence[Optional[float]]) -> np.ndarray:
+    """Per-candidate relevance in [0, 1], from search scores, vector distances or rank order."""
+    count = len(scores)
+    if count and all(score is not None for score in scores):
+        relevance = np.asarray(scores, dtype=np.float32)
+    elif count and all(distance is not None for distance in distances):
+        relevance = 1 - np.asarray(distances, dtype=np.float32)
+    else:
+        # Candidates arrive best first, so fall back to a linear rank decay
+        relevance = np.linspace(1, 0, count, endpoint=False, dtype=np.float32)
+    spread = relevance.max() - relevance.min() if count else 0
+    return (relevance - relevance.min()) / spread if spread > 0 else np.ones(count, dtype=np.float32)
+
+
+def candidate_matrix(vectors: Sequence[Optional[Sequence[float]]], texts: Sequence[Optional[str]]) -> Optional[np.ndarray]:
+    """Unit-length rows to compare candidates by, or None if there is nothing to compare.
+
+    Stored vectors are used when every candidate has one of the same length;
+    otherwise the text is embedded locally, which still catches the
+    near-verbatim duplicates that re-uploads produce.
+    """
+    if vectors and all(vector is not None for vector in vectors) and len({len(vector) for vector in vectors}) == 1:
+        matrix = np.asarray(vectors, dtype=np.float32)
+    elif texts and all(text is not None for text in texts):
+        matrix = np.stack([_content_embedder.embed(text) for text in texts])
+    else:
+        return None
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def mmr_select(matrix: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Greedily pick k rows maximizing lambda * relevance - (1 - lambda) * max similarity to rows already picked.
+
+    lambda_mult=1 keeps the original ranking; lower values trade relevance
+    for diversity. The pairwise similarities are one matrix product, so each
+    step is a vectorized pass over the candidates.
+    """
+    count = matrix.shape[0]
+    k = min(k, count)
+    similarity = matrix @ matrix.T
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected: List[int] = []
+    for _ in range(k):
+        gain = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(gain))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def diversify(hits: list, k: int, lambda_mult: float) -> list:
+    """Re-select k of the ranked SearchHits by maximal marginal relevance.
+
+    Hits that cannot be compared (no vectors and no content) keep their
+    original order.
+    """
+    if len(hits) <= 1:
+        return hits[:k]
+    matrix = candidate_matrix(
+        [hit.vector for hit in hits],
+        [(hit.properties or {}).get("content") for hit in hits]
+    )
+    if matrix is None:
+        return hits[:k]
+    relevance = relevance_scores([hit.score for hit in hits], [hit.distance for hit in hits])
+    return [hits[i] for i in mmr_select(matrix, relevance, k, lambda_mult)]
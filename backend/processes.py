@@ -0,0 +1,12 @@
+import os
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this pid is still running (on this host)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
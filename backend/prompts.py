@@ -0,0 +1,39 @@
+from typing import Any, Dict, List
+
+
+def chunk_header(document: Dict[str, Any]) -> str:
+    """The line introducing each chunk in the system prompt."""
+    return f"Document: {document.get('filename', 'Unknown filename')}\n"
+
+
+def build_system_prompt(documents: List[Dict[str, Any]]) -> str:
+    """Build the RAG system prompt from retrieved document chunks."""
+    if not documents:
+        return (
+            "You are an AI assistant that helps users find information in their documents. "
+            "However, I couldn't find any relevant documents for this query. "
+            "Please let the user know and offer general assistance."
+        )
+
+    document_contents = "\n\n".join(
+        chunk_header(doc) + doc["content"] for doc in documents
+    )
+    return (
+        "You are an AI assistant that helps users find information in their documents.\n"
+        "Use the following relevant document contents to answer the user's questions:\n\n"
+        f"{document_contents}\n\n"
+        "If the answer is not in the documents, say so clearly. Do not make up information.\n"
+        "Always cite the document filename when providing information from a specific document."
+    )
+
+
+def build_citations(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reduce retrieved chunks to the compact references returned alongside an answer."""
+    return [
+        {
+            "filename": doc["filename"],
+            "chunk_index": doc.get("chunk_index"),
+            "offset": doc.get("offset")
+        }
+        for doc in documents
+    ]
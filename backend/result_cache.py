@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from structured_logging import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+# Search result cache settings (TTL in seconds)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Counter file that in-memory caches of every worker compare against ("" keeps it per process)
+CACHE_VERSION_PATH = os.getenv("CACHE_VERSION_PATH", "cache_version")
+
+logger = get_logger("result_cache")
+
+
+class CacheVersion:
+    """Data version shared by every worker process through a small counter file.
+
+    bump() rewrites the file under an exclusive lock and renames it into
+    place, so current() can read it without locking and never sees a partial
+    write. Each read is one small local file read, far cheaper than the
+    searches and LLM calls the caches save. Without a path the counter lives
+    in this process only.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_VERSION_PATH):
+        self.path = path or None
+        self._local = 0
+
+    def current(self) -> int:
+        if self.path is None:
+            return self._local
+        try:
+            with open(self.path, "rb") as version_file:
+                return int(version_file.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        if self.path is None:
+            self._local += 1
+            return self._local
+        with open(f"{self.path}.lock", "ab") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            version = self.current() + 1
+            temporary = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            with open(temporary, "wb") as version_file:
+                version_file.write(str(version).encode())
+            os.replace(temporary, self.path)
+        return version
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry.
+
+    Entries are per worker, but the version comes from a CacheVersion shared
+    by all workers, so an upload handled by one of them drops every worker's
+    entries on its next lookup.
+    """
+
+    def __init__(
+        self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL, version: Optional[CacheVersion] = None
+    ):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.shared_version = version or CacheVersion(None)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._version = self.shared_version.current()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def version(self) -> int:
+        version = self.shared_version.current()
+        if version != self._version:
+            # Old entries can never be hit again, so drop them right away
+            self._version = version
+            self._entries.clear()
+        return version
+
+    async def bump_version(self) -> int:
+        self.shared_version.bump()
+        return await self.version()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis store shared by all workers. Requires the optional redis package."""
+
+    def __init__(self, url: str = RESULT_CACHE_REDIS_URL, ttl: float = RESULT_CACHE_TTL, prefix: str = "search:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any) -> None:
+        # Redis evicts by its own maxmemory policy; configure allkeys-lru for LRU behaviour
+        await self.redis.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    async def version(self) -> int:
+        return int(await self.redis.get(self.prefix + "version") or 0)
+
+    async def bump_version(self) -> int:
+        return int(await self.redis.incr(self.prefix + "version"))
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ResultCache:
+    """Caches search responses keyed by normalized query text and parameters.
+
+    Keys embed a version number that is bumped whenever new objects are
+    written, so stale results are never served after an upload.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query_text: str) -> str:
+        return " ".join(query_text.lower().split())
+
+    async def make_key(self, query_text: str, params: Dict[str, Any]) -> str:
+        version = await self.backend.version()
+        encoded_params = json.dumps(params, sort_keys=True, default=str)
+        return f"{version}:{self.normalize_query(query_text)}:{encoded_params}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.backend.set(key, value)
+
+    async def invalidate(self) -> None:
+        await self.backend.bump_version()
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": self.backend.size(),
+            "version": await self.backend.version()
+        }
+
+
+def create_result_cache(version: Optional[CacheVersion] = None) -> ResultCache:
+    """Build the cache selected by RESULT_CACHE_BACKEND, falling back to memory.
+
+    The memory backend follows version, so uploads invalidate it in every worker.
+    """
+    if RESULT_CACHE_BACKEND == "redis":
+        try:
+            return ResultCache(RedisBackend())
+        except ImportError:
+            logger.warning("redis package not installed, using in-memory result cache")
+    return ResultCache(MemoryBackend(version=version))
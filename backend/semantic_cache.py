@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Semantic /chat cache settings (opt-in)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# Minimum cosine similarity for a hit. HashingEmbedder compares wording, not
+# meaning, so this stays high enough to only accept near-verbatim repeats.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.99"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+
+
+class HashingEmbedder:
+    """Embeds text locally by hashing word unigrams/bigrams and character trigrams.
+
+    No model or network call is needed, which keeps cache lookups far cheaper
+    than the LLM round trip they replace. It measures shared wording, not
+    meaning: "reset my password" and "do not reset my password" score about
+    0.93, so with the default threshold it only catches near-verbatim repeats
+    (case, punctuation, spacing). To match real paraphrases, pass an embedder
+    backed by a sentence-embedding model; anything with an embed(text) method
+    returning a unit-length float32 vector works.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = "".join(ch if ch.isalnum() else " " for ch in text.lower()).split()
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vector[zlib.crc32(feature.encode()) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Answers chat questions from earlier answers to sufficiently similar questions.
+
+    Question embeddings live in a preallocated float32 matrix used as a ring
+    buffer, so a lookup is one matrix-vector product over the filled rows.
+    Entries are scoped by model (or a conversation_scope) and the whole cache is cleared whenever the
+    Document collection changes. Pass the CacheVersion the result cache uses
+    so an upload in any worker clears the cache in all of them.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        capacity: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+        version=None,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.enabled = enabled
+        self._vectors = np.zeros((self.capacity, self.embedder.dim), dtype=np.float32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._count = 0
+        self._next = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.shared_version = version
+        self._version = version.current() if version is not None else 0
+
+    def _sync_version(self) -> None:
+        if self.shared_version is None:
+            return
+        version = self.shared_version.current()
+        if version != self._version:
+            self._version = version
+            self._clear()
+
+    def lookup(self, question: str, model: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry (answer plus any extras) for a similar question, or None."""
+        self._sync_version()
+        if self._count:
+            scores = self._vectors[:self._count] @ self.embedder.embed(question)
+            # Only consider entries produced by the same model
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self.threshold:
+                    break
+                entry = self._entries[index]
+                if entry["model"] == model:
+                    self.hits += 1
+                    self.saved_seconds += entry["latency"]
+                    return entry
+        self.misses += 1
+        return None
+
+    def store(
+        self, question: str, model: str, answer: str, latency: float, extra: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Remember an answer along with how long the LLM took to produce it."""
+        if not answer:
+            return
+        self._sync_version()
+        self._vectors[self._next] = self.embedder.embed(question)
+        self._entries[self._next] = {**(extra or {}), "model": model, "answer": answer, "latency": latency}
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def invalidate(self) -> None:
+        if self.shared_version is not None:
+            self._version = self.shared_version.bump()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._entries = [None] * self.capacity
+        self._count = 0
+        self._next = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": self._count,
+            "saved_latency_seconds": round(self.saved_seconds, 3)
+        }
+
+
+class StreamAccumulator:
+    """Collects the assistant text out of OpenAI-compatible SSE bytes as they are relayed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._buffer = b""
+        self._parts: List[str] = []
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                continue
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                self._parts.append(delta)
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+
+def latest_user_message(body: Dict[str, Any]) -> Optional[str]:
+    """Return the text of the last user message in a chat completion request."""
+    for message in reversed(body.get("messages") or []):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return None
+
+
+def conversation_scope(body: Dict[str, Any], model: str, **params: Any) -> str:
+    """Cache scope of a chat request: the model plus a hash of everything but the latest user message.
+
+    The system prompt, which carries the document set for /chat, and the
+    earlier turns are part of the scope, so a follow-up like "summarize it"
+    is only answered from the same conversation. params (e.g. retrieval
+    settings) are hashed in as well.
+    """
+    messages = list(body.get("messages") or [])
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index].get("role") == "user" and isinstance(messages[index].get("content"), str):
+            del messages[index]
+            break
+    context = json.dumps({"messages": messages, "params": params}, sort_keys=True, default=str)
+    return f"{model}:{hashlib.sha256(context.encode()).hexdigest()[:32]}"
@@ -0,0 +1,55 @@
+import json
+import datetime
+from typing import Any, AsyncIterable, AsyncIterator
+
+import numpy as np
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON in one pass, with datetimes as ISO 8601 strings.
+
+    Uses orjson when it is installed and the standard library otherwise;
+    both produce the same output for the types the API returns.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(), so datetimes need no pre-encoding round trip."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def _ndjson_lines(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield dumps(item) + b"\n"
+
+
+def ndjson_response(items: AsyncIterable[Any], status_code: int = 200, headers=None) -> StreamingResponse:
+    """Stream items as newline-delimited JSON, sending each one as soon as it is produced."""
+    return StreamingResponse(
+        _ndjson_lines(items), status_code=status_code, media_type="application/x-ndjson", headers=headers
+    )
@@ -0,0 +1,68 @@
+"""Production entry point: python serve.py
+
+Runs main:app under uvicorn with one worker process per CPU core by default.
+Workers are spawned fresh rather than forked from a parent holding
+connections, and each opens its own vector store and HTTP clients in
+startup_event. On SIGTERM every worker stops accepting connections, lets
+in-flight requests finish for up to GRACEFUL_SHUTDOWN_TIMEOUT seconds, then
+runs shutdown_event to close its clients.
+
+Workers keep their own search and chat caches, but all of them follow one
+version counter file (CACHE_VERSION_PATH), so an upload handled by any
+worker invalidates every cache. Each worker also publishes its metrics to
+METRICS_DIR, so /metrics reports all workers whichever one answers.
+"""
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from structured_logging import get_logger
+
+# Server settings (timeouts in seconds)
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+
+logger = get_logger("serve")
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on, respecting container CPU affinity."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    workers = int(os.getenv("WEB_CONCURRENCY") or available_cores())
+    if workers > 1 and os.getenv("VECTOR_STORE", "weaviate").lower() == "memory":
+        logger.warning("The memory vector store cannot be shared between processes, running a single worker")
+        return 1
+    return max(1, workers)
+
+
+def main() -> None:
+    workers = worker_count()
+    if workers > 1:
+        # Split the extraction processes between workers instead of giving each one half the machine
+        os.environ.setdefault("EXTRACT_WORKERS", str(max(1, available_cores() // (2 * workers))))
+        # Let whichever worker answers a scrape report the metrics of all of them
+        os.environ.setdefault("METRICS_DIR", "metrics")
+    logger.info(f"Starting {workers} worker(s) on {HOST}:{PORT}")
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import re
+from typing import List, Tuple
+
+# Default snippet settings (sizes in characters)
+SNIPPET_WINDOW = 160
+MAX_SNIPPETS = 3
+SNIPPET_SEPARATOR = " ... "
+
+
+def query_terms(query_text: str) -> List[str]:
+    """Lowercased query words worth highlighting (single characters are skipped)."""
+    words = re.findall(r"\w+", query_text.lower())
+    return sorted({word for word in words if len(word) > 1}, key=len, reverse=True)
+
+
+def _match_windows(text: str, terms: List[str], window: int) -> List[Tuple[int, int]]:
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")", re.IGNORECASE)
+    half = window // 2
+    windows: List[Tuple[int, int]] = []
+    for match in pattern.finditer(text):
+        start = max(0, match.start() - half)
+        end = min(len(text), match.end() + half)
+        # Merge windows that overlap the previous one
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def extract_snippets(
+    text: str, query_text: str, window: int = SNIPPET_WINDOW, max_snippets: int = MAX_SNIPPETS
+) -> List[str]:
+    """Return up to max_snippets windows of text around query term matches.
+
+    Windows that overlap are merged. When no term matches (e.g. a pure vector
+    hit), the opening window of the text is returned instead.
+    """
+    terms = query_terms(query_text)
+    windows = _match_windows(text, terms, window) if terms else []
+    if not windows:
+        return [text[:window].strip()] if text else []
+    return [text[start:end].strip() for start, end in windows[:max_snippets]]
+
+
+def truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut text so its UTF-8 encoding fits in max_bytes, without splitting a character."""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max(0, max_bytes)].decode("utf-8", errors="ignore")
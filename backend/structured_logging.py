@@ -0,0 +1,67 @@
+import os
+import json
+import random
+import logging
+import datetime
+
+# Logging settings: LOG_SAMPLE_RATE keeps that fraction of DEBUG/INFO records
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Drops a random share of DEBUG/INFO records; warnings and errors are always kept."""
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def configure_logging() -> None:
+    """Install the backend's log handler on the "weavdemo" logger (idempotent)."""
+    logger = logging.getLogger("weavdemo")
+    if getattr(logger, "_configured", False):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(SamplingFilter())
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    logger._configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a child of the "weavdemo" logger, e.g. get_logger("search")."""
+    configure_logging()
+    return logging.getLogger(f"weavdemo.{name}")
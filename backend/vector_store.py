@@ -0,0 +1,411 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import weaviate
+from weaviate.config import AdditionalConfig, ConnectionConfig, GrpcConfig, Timeout
+from weaviate.classes.config import Configure, Property, DataType
+from weaviate.classes.query import MetadataQuery
+
+from collection_registry import CollectionRegistry
+from structured_logging import get_logger
+
+# Storage engine: "weaviate" (the cloud cluster) or "memory" (in-process NumPy engine)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "weaviate").lower()
+
+# Batched ingestion settings
+WEAVIATE_BATCH_SIZE = int(os.getenv("WEAVIATE_BATCH_SIZE", "100"))
+WEAVIATE_BATCH_CONCURRENCY = int(os.getenv("WEAVIATE_BATCH_CONCURRENCY", "2"))
+
+# Weaviate client connection settings (timeouts in seconds, keepalives in milliseconds)
+WEAVIATE_POOL_CONNECTIONS = int(os.getenv("WEAVIATE_POOL_CONNECTIONS", "20"))
+WEAVIATE_POOL_MAXSIZE = int(os.getenv("WEAVIATE_POOL_MAXSIZE", "100"))
+WEAVIATE_POOL_TIMEOUT = int(os.getenv("WEAVIATE_POOL_TIMEOUT", "5"))
+WEAVIATE_INIT_TIMEOUT = float(os.getenv("WEAVIATE_INIT_TIMEOUT", "2"))
+WEAVIATE_QUERY_TIMEOUT = float(os.getenv("WEAVIATE_QUERY_TIMEOUT", "30"))
+WEAVIATE_INSERT_TIMEOUT = float(os.getenv("WEAVIATE_INSERT_TIMEOUT", "90"))
+WEAVIATE_GRPC_KEEPALIVE_MS = int(os.getenv("WEAVIATE_GRPC_KEEPALIVE_MS", "30000"))
+WEAVIATE_GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv("WEAVIATE_GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))
+
+logger = get_logger("vector_store")
+
+# Property specs are (name, type) pairs; types map onto Weaviate data types
+PROPERTY_TYPES = {
+    "text": DataType.TEXT,
+    "int": DataType.INT,
+    "number": DataType.NUMBER,
+    "date": DataType.DATE,
+}
+
+_PROPERTY_TYPE_NAMES = {data_type: name for name, data_type in PROPERTY_TYPES.items()}
+
+PropertySpec = Sequence[Tuple[str, str]]
+
+
+class SearchHit:
+    """One object returned by a store query.
+
+    score is set by keyword and hybrid searches, distance by vector searches.
+    vector is only filled in when the query asked for it.
+    """
+
+    __slots__ = ("uuid", "properties", "score", "distance", "vector")
+
+    def __init__(
+        self,
+        uuid: str,
+        properties: Dict[str, Any],
+        score: Optional[float] = None,
+        distance: Optional[float] = None,
+        vector: Optional[List[float]] = None,
+    ):
+        self.uuid = uuid
+        self.properties = properties
+        self.score = score
+        self.distance = distance
+        self.vector = vector
+
+
+class StoreCollection:
+    """Handle to one collection of a VectorStore.
+
+    Objects passed to insert_many need properties, uuid and (optionally)
+    vector attributes, like weaviate.classes.data.DataObject. Searches fill
+    in SearchHit.vector only when called with include_vector=True, and skip
+    the first offset hits so long result lists can be read page by page.
+    """
+
+    name: str
+
+    async def insert_many(self, objects: List[Any]) -> Dict[int, str]:
+        """Insert or replace objects, returning {index: error message} for failures."""
+        raise NotImplementedError
+
+    async def exists(self, object_id: str) -> bool:
+        raise NotImplementedError
+
+    async def property_spec(self) -> PropertySpec:
+        """The collection's properties as (name, type) pairs, types as in PROPERTY_TYPES."""
+        raise NotImplementedError
+
+    async def hybrid(
+        self,
+        query: str,
+        limit: int = 5,
+        alpha: float = 0.5,
+        return_properties: Optional[List[str]] = None,
+        include_vector: bool = False,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        raise NotImplementedError
+
+    async def bm25(
+        self,
+        query: str,
+        limit: int = 5,
+        query_properties: Optional[List[str]] = None,
+        return_properties: Optional[List[str]] = None,
+        include_vector: bool = False,
+        offset: int = 0,
+    ) -> List[SearchHit]:
+        raise NotImplementedError
+
+    async def near_vector(
+        self, vector: Sequence[float], limit: int = 5, return_properties: Optional[List[str]] = None
+    ) -> List[SearchHit]:
+        raise NotImplementedError
+
+    async def fetch(
+        self, limit: int = 5, return_properties: Optional[List[str]] = None, offset: int = 0
+    ) -> List[SearchHit]:
+        """Return up to limit objects in no particular ranking."""
+        raise NotImplementedError
+
+    async def list_objects(
+        self,
+        after: Optional[str] = None,
+        limit: int = 100,
+        return_properties: Optional[List[str]] = None,
+        include_vector: bool = False,
+    ) -> List[SearchHit]:
+        """Return up to limit objects in id order, starting after the given id (a cursor)."""
+        raise NotImplementedError
+
+
+class VectorStore:
+    """Storage engine behind the API: connection lifecycle plus collection handles."""
+
+    async def connect(self) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+    async def meta(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def ready(self) -> bool:
+        """Cheap connectivity check, suitable for polling."""
+        raise NotImplementedError
+
+    async def get_collection(self, name: str) -> Optional[StoreCollection]:
+        """Return a handle to the collection, or None if it does not exist."""
+        raise NotImplementedError
+
+    async def create_collection(self, name: str, properties: PropertySpec) -> StoreCollection:
+        raise NotImplementedError
+
+    async def configure_collection(self, name: str, properties: PropertySpec) -> None:
+        """Bring an existing collection up to date, e.g. add properties added since it was created."""
+        raise NotImplementedError
+
+
+async def insert_batched(
+    collection: StoreCollection,
+    objects: List[Any],
+    batch_size: int = WEAVIATE_BATCH_SIZE,
+    concurrency: int = WEAVIATE_BATCH_CONCURRENCY,
+) -> Dict[int, str]:
+    """Insert objects with insert_many in batch_size batches, up to concurrency of them at a time.
+
+    Returns a mapping of object index to error message for every failed object.
+    """
+    batch_size = max(1, batch_size)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def insert_batch(offset: int) -> Dict[int, str]:
+        batch = objects[offset:offset + batch_size]
+        async with semaphore:
+            try:
+                batch_errors = await collection.insert_many(batch)
+            except Exception as batch_error:
+                logger.warning(f"Batch insert at offset {offset} failed: {batch_error}")
+                return {offset + i: str(batch_error) for i in range(len(batch))}
+        return {offset + i: message for i, message in batch_errors.items()}
+
+    errors: Dict[int, str] = {}
+    batch_results = await asyncio.gather(
+        *(insert_batch(offset) for offset in range(0, len(objects), batch_size))
+    )
+    for batch_errors in batch_results:
+        errors.update(batch_errors)
+    return errors
+
+
+def _already_exists(error: Exception) -> bool:
+    """Whether a create failed because the collection exists (e.g. another worker just made it)."""
+    return "already exists" in str(error).lower()
+
+
+def _weaviate_hit(obj) -> SearchHit:
+    metadata = getattr(obj, "metadata", None)
+    vector = getattr(obj, "vector", None) or None
+    if isinstance(vector, dict):
+        vector = vector.get("default") or next(iter(vector.values()), None)
+    return SearchHit(
+        str(obj.uuid),
+        obj.properties,
+        getattr(metadata, "score", None),
+        getattr(metadata, "distance", None),
+        vector
+    )
+
+
+class WeaviateCollection(StoreCollection):
+    RETURN_METADATA = MetadataQuery(score=True, distance=True)
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.name = getattr(handle, "name", "")
+
+    async def insert_many(self, objects: List[Any]) -> Dict[int, str]:
+        response = await self.handle.data.insert_many(objects)
+        return {i: error.message for i, error in response.errors.items()}
+
+    async def exists(self, object_id: str) -> bool:
+        return await self.handle.data.exists(object_id)
+
+    async def property_spec(self) -> PropertySpec:
+        config = await self.handle.config.get()
+        return [(prop.name, _PROPERTY_TYPE_NAMES.get(prop.data_type, "text")) for prop in config.properties]
+
+    async def hybrid(
+        self, query, limit=5, alpha=0.5, return_properties=None, include_vector=False, offset=0
+    ) -> List[SearchHit]:
+        response = await self.handle.query.hybrid(
+            query=query,
+            alpha=alpha,
+            limit=limit,
+            offset=offset or None,
+            return_properties=return_properties,
+            return_metadata=self.RETURN_METADATA,
+            include_vector=include_vector
+        )
+        return [_weaviate_hit(obj) for obj in response.objects]
+
+    async def bm25(
+        self, query, limit=5, query_properties=None, return_properties=None, include_vector=False, offset=0
+    ) -> List[SearchHit]:
+        response = await self.handle.query.bm25(
+            query=query,
+            query_properties=query_properties,
+            limit=limit,
+            offset=offset or None,
+            return_properties=return_properties,
+            return_metadata=self.RETURN_METADATA,
+            include_vector=include_vector
+        )
+        return [_weaviate_hit(obj) for obj in response.objects]
+
+    async def near_vector(self, vector, limit=5, return_properties=None) -> List[SearchHit]:
+        response = await self.handle.query.near_vector(
+            near_vector=[float(value) for value in vector],
+            limit=limit,
+            return_properties=return_properties,
+            return_metadata=self.RETURN_METADATA
+        )
+        return [_weaviate_hit(obj) for obj in response.objects]
+
+    async def fetch(self, limit=5, return_properties=None, offset=0) -> List[SearchHit]:
+        response = await self.handle.query.fetch_objects(
+            limit=limit, offset=offset or None, return_properties=return_properties
+        )
+        return [_weaviate_hit(obj) for obj in response.objects]
+
+    async def list_objects(self, after=None, limit=100, return_properties=None, include_vector=False) -> List[SearchHit]:
+        response = await self.handle.query.fetch_objects(
+            after=after, limit=limit, return_properties=return_properties, include_vector=include_vector
+        )
+        return [_weaviate_hit(obj) for obj in response.objects]
+
+
+def client_config() -> AdditionalConfig:
+    """Connection pool, timeout and gRPC keepalive settings for the Weaviate client.
+
+    Keepalive pings stop idle gRPC channels from being silently dropped by
+    load balancers between queries, which otherwise shows up as a slow or
+    failed first query after a quiet period.
+    """
+    return AdditionalConfig(
+        connection=ConnectionConfig(
+            session_pool_connections=WEAVIATE_POOL_CONNECTIONS,
+            session_pool_maxsize=WEAVIATE_POOL_MAXSIZE,
+            session_pool_timeout=WEAVIATE_POOL_TIMEOUT
+        ),
+        timeout=Timeout(init=WEAVIATE_INIT_TIMEOUT, query=WEAVIATE_QUERY_TIMEOUT, insert=WEAVIATE_INSERT_TIMEOUT),
+        grpc_config=GrpcConfig(channel_options=[
+            ("grpc.keepalive_time_ms", WEAVIATE_GRPC_KEEPALIVE_MS),
+            ("grpc.keepalive_timeout_ms", WEAVIATE_GRPC_KEEPALIVE_TIMEOUT_MS),
+            ("grpc.keepalive_permit_without_calls", 1)
+        ])
+    )
+
+
+class WeaviateStore(VectorStore):
+    """The Weaviate cloud cluster, with collection lookups cached by a CollectionRegistry."""
+
+    def __init__(self, url: Optional[str], api_key: Optional[str], registry: Optional[CollectionRegistry] = None):
+        self.url = url
+        self.api_key = api_key
+        self.registry = registry or CollectionRegistry()
+        self.client = None
+
+    async def connect(self) -> None:
+        self.client = weaviate.use_async_with_weaviate_cloud(
+            cluster_url=self.url,
+            auth_credentials=weaviate.AuthApiKey(api_key=self.api_key),
+            additional_config=client_config()
+        )
+        await self.client.connect()
+        self.registry.bind(self.client)
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+
+    async def meta(self) -> Dict[str, Any]:
+        return await self.client.get_meta()
+
+    async def ready(self) -> bool:
+        return self.client is not None and await self.client.is_ready()
+
+    async def get_collection(self, name: str) -> Optional[StoreCollection]:
+        handle = await self.registry.get(name)
+        return WeaviateCollection(handle) if handle is not None else None
+
+    async def create_collection(self, name: str, properties: PropertySpec) -> StoreCollection:
+        weaviate_properties = [
+            Property(name=prop_name, data_type=PROPERTY_TYPES[prop_type]) for prop_name, prop_type in properties
+        ]
+        # Prefer a real vectorizer, but fall back to none if the cluster lacks the module
+        try:
+            logger.info(f"Creating collection {name} with text2vec_transformers vectorizer")
+            await self.client.collections.create(
+                name=name,
+                properties=weaviate_properties,
+                vectorizer_config=Configure.Vectorizer.text2vec_transformers()
+            )
+        except Exception as vectorizer_error:
+            if _already_exists(vectorizer_error):
+                logger.info(f"Collection {name} was created by another worker")
+            else:
+                logger.warning(f"Error creating collection with text2vec_transformers: {vectorizer_error}")
+                try:
+                    logger.info(f"Creating collection {name} with 'none' vectorizer")
+                    await self.client.collections.create(
+                        name=name,
+                        properties=weaviate_properties,
+                        vectorizer_config=Configure.Vectorizer.none()
+                    )
+                except Exception as none_error:
+                    if not _already_exists(none_error):
+                        logger.error(f"Error creating collection with 'none' vectorizer: {none_error}")
+                        raise
+                    logger.info(f"Collection {name} was created by another worker")
+        self.registry.invalidate()
+        return await self.get_collection(name)
+
+    async def configure_collection(self, name: str, properties: PropertySpec) -> None:
+        await self.registry.refresh()
+        handle = await self.registry.get(name)
+        if handle is None:
+            logger.info(f"{name} collection does not exist, will be created when files are uploaded")
+            return
+
+        logger.info(f"Configuring {name} collection")
+        config = await handle.config.get()
+        logger.debug("%s collection vectorizer: %s", name, config.vectorizer)
+
+        # Update vectorizer if needed
+        if not config.vectorizer or config.vectorizer == "none":
+            logger.info(f"Setting vectorizer for {name} collection")
+            try:
+                await handle.config.update_vectorizer(vectorizer=Configure.Vectorizer.text2vec_transformers())
+                logger.info("Vectorizer updated successfully")
+            except Exception as vectorizer_error:
+                logger.warning(f"Error updating vectorizer: {vectorizer_error}")
+                try:
+                    await handle.config.update_vectorizer(vectorizer=Configure.Vectorizer.none())
+                    logger.info("Set to 'none' vectorizer successfully")
+                except Exception as alt_error:
+                    logger.error(f"Error setting alternative vectorizer: {alt_error}")
+
+        # Add properties to collections created before they existed
+        existing_properties = {prop.name for prop in config.properties}
+        for prop_name, prop_type in properties:
+            if prop_name not in existing_properties:
+                logger.info(f"Adding {prop_name} property to {name} collection")
+                await handle.config.add_property(Property(name=prop_name, data_type=PROPERTY_TYPES[prop_type]))
+                self.registry.invalidate()
+
+
+def create_vector_store(
+    url: Optional[str] = None, api_key: Optional[str] = None, registry: Optional[CollectionRegistry] = None
+) -> VectorStore:
+    """Build the engine selected by VECTOR_STORE."""
+    if VECTOR_STORE == "memory":
+        from memory_store import MemoryStore
+        return MemoryStore()
+    if VECTOR_STORE != "weaviate":
+        logger.warning(f"Unknown VECTOR_STORE {VECTOR_STORE!r}, using weaviate")
+    return WeaviateStore(url, api_key, registry)
@@ -9,8 +9,68 @@ interface FileUploaderProps {
   onFilesUploaded: (files: File[]) => void;
 }
 
+interface UploadFileResult {
+  filename: string;
+  status: string;
+  chunks?: number;
+  error?: string;
+}
+
+interface UploadJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: { files_total: number; files_done: number };
+  errors: { filename?: string; error: string }[];
+  files: UploadFileResult[];
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+const STATUS_LABELS: Record<string, string> = {
+  uploading: 'Uploading...',
+  queued: 'Queued',
+  processing: 'Processing...',
+  uploaded: 'Uploaded',
+  duplicate: 'Already uploaded',
+  error: 'Failed',
+};
+
+// Poll an ingestion job until the backend reports it finished
+const waitForJob = async (apiUrl: string, jobId: string, onUpdate: (job: UploadJob) => void): Promise<UploadJob> => {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  while (true) {
+    const response = await fetch(`${apiUrl}/jobs/${jobId}`, {
+      headers: {
+        'Accept': 'application/json',
+      },
+      mode: 'cors',
+    });
+    if (!response.ok) {
+      throw new Error(`Job status request failed: ${response.status} ${response.statusText}`);
+    }
+    const job: UploadJob = await response.json();
+    onUpdate(job);
+    if (job.status === 'completed' || job.status === 'failed') {
+      return job;
+    }
+    if (Date.now() > deadline) {
+      throw new Error('Timed out waiting for the upload to be processed');
+    }
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+};
+
 const FileUploader = ({ onFilesUploaded }: FileUploaderProps) => {
   const [files, setFiles] = useState<File[]>([]);
+  const [fileStatuses, setFileStatuses] = useState<Record<string, UploadFileResult>>({});
+
+  const updateFileStatuses = (results: UploadFileResult[]) => {
+    setFileStatuses(prevStatuses => ({
+      ...prevStatuses,
+      ...Object.fromEntries(results.map(result => [result.filename, result])),
+    }));
+  };
 
   const onDrop = useCallback((acceptedFiles: File[]) => {
     // Check file types
@@ -61,6 +121,8 @@ const FileUploader = ({ onFilesUploaded }: FileUploaderProps) => {
         return;
       }
 
+      updateFileStatuses(uploadFiles.map(file => ({ filename: file.name, status: 'uploading' })));
+
       // Add CORS headers
       console.log('Sending fetch request to:', uploadUrl);
       console.log('Request mode:', 'cors');
@@ -104,11 +166,37 @@ const FileUploader = ({ onFilesUploaded }: FileUploaderProps) => {
       }
 
       if (response.ok) {
-        console.log('Upload successful! Response was OK (status in 200-299 range)');
-        toast({
-          title: 'Upload successful',
-          description: `${uploadFiles.length} file(s) uploaded to Weaviate.`,
-        });
+        console.log('Upload accepted! Response was OK (status in 200-299 range)');
+
+        // A 202 means the files were queued as a job; poll it until every file is processed
+        let results: UploadFileResult[] = responseData?.results ?? [];
+        let jobError = '';
+        if (response.status === 202 && responseData?.job_id) {
+          updateFileStatuses(responseData.files ?? []);
+          const job = await waitForJob(apiUrl, responseData.job_id, update => updateFileStatuses(update.files));
+          console.log('Upload job finished:', job);
+          results = job.files;
+          if (job.status === 'failed') {
+            jobError = job.errors.find(entry => !entry.filename)?.error || 'Processing failed';
+          }
+        }
+        updateFileStatuses(results);
+
+        const uploaded = results.filter(result => result.status === 'uploaded').length;
+        const duplicates = results.filter(result => result.status === 'duplicate').length;
+        const failed = results.filter(result => result.status === 'error');
+        if (jobError || failed.length) {
+          toast({
+            title: uploaded ? 'Upload finished with errors' : 'Upload failed',
+            description: jobError || failed.map(result => `${result.filename}: ${result.error}`).join('; '),
+            variant: 'destructive',
+          });
+        } else {
+          toast({
+            title: 'Upload successful',
+            description: `${uploaded} file(s) uploaded to Weaviate${duplicates ? `, ${duplicates} already uploaded` : ''}.`,
+          });
+        }
       } else {
         let errorMessage = 'An error occurred uploading files.';
 
@@ -124,6 +212,7 @@ const FileUploader = ({ onFilesUploaded }: FileUploaderProps) => {
 
         console.error('Upload failed with status:', response.status);
         console.error('Error message:', errorMessage);
+        updateFileStatuses(uploadFiles.map(file => ({ filename: file.name, status: 'error', error: errorMessage })));
 
         toast({
           title: 'Upload failed',
@@ -213,6 +302,15 @@ const FileUploader = ({ onFilesUploaded }: FileUploaderProps) => {
                     <p className="text-xs text-muted-foreground">
                       {(file.size / 1024 / 1024).toFixed(2)} MB
                     </p>
+                    {fileStatuses[file.name] && (
+                      <p
+                        className={`text-xs truncate ${fileStatuses[file.name].status === 'error' ? 'text-destructive' : 'text-muted-foreground'}`}
+                        title={fileStatuses[file.name].error}
+                      >
+                        {STATUS_LABELS[fileStatuses[file.name].status] ?? fileStatuses[file.name].status}
+                        {fileStatuses[file.name].error ? `: ${fileStatuses[file.name].error}` : ''}
+                      </p>
+                    )}
                   </div>
                 </div>
 
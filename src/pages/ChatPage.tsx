@@ -59,18 +59,31 @@ const ChatPage = ({ logoUrl }: ChatPageProps) => {
         content
       });
 
-      // Generate AI response using DeepSeek
-      const aiResponseContent = await generateChatResponse(chatMessages, content);
-
-      // Add AI response
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: aiResponseContent,
-        timestamp: new Date()
+      // Add or update the AI response as it streams in
+      const assistantId = (Date.now() + 1).toString();
+      const upsertAssistantMessage = (responseContent: string) => {
+        setMessages(prev => {
+          const existing = prev.find(msg => msg.id === assistantId);
+          if (existing) {
+            return prev.map(msg => msg.id === assistantId ? { ...msg, content: responseContent } : msg);
+          }
+          const assistantMessage: Message = {
+            id: assistantId,
+            role: 'assistant',
+            content: responseContent,
+            timestamp: new Date()
+          };
+          return [...prev, assistantMessage];
+        });
       };
 
-      setMessages(prev => [...prev, assistantMessage]);
+      // Generate AI response using DeepSeek, hiding the typing indicator on the first token
+      const aiResponseContent = await generateChatResponse(chatMessages, content, (partial) => {
+        setIsLoading(false);
+        upsertAssistantMessage(partial);
+      });
+
+      upsertAssistantMessage(aiResponseContent);
     } catch (error) {
       console.error('Error generating AI response:', error);
       toast({
@@ -30,6 +30,29 @@ export interface WeaviateDocument {
   filename: string;
   content: string;
   uploaded_at: string;
+  chunk_index?: number;
+  offset?: number;
+}
+
+export interface Citation {
+  filename: string;
+  chunk_index: number | null;
+  offset: number | null;
+}
+
+export interface ContextSummary {
+  budget: number;
+  tokens_used: number;
+  tokens_dropped: number;
+  chunks_used: number;
+  chunks_dropped: number;
+  chunks_truncated: number;
+}
+
+export interface RagResponse {
+  answer: string;
+  citations: Citation[];
+  context?: ContextSummary;
 }
 
 // Function to search Weaviate for relevant documents based on a query
@@ -91,66 +114,101 @@ function getMockDocuments(query: string): WeaviateDocument[] {
   ];
 }
 
+// Function to read an OpenAI-compatible server-sent event stream, reporting the text so far
+async function readChatStream(
+  body: ReadableStream<Uint8Array>,
+  onToken: (content: string) => void
+): Promise<string> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let content = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by newlines; keep any partial line for the next read
+    const lines = buffer.split('\n');
+    buffer = lines.pop() || '';
+    for (const line of lines) {
+      const trimmed = line.trim();
+      if (!trimmed.startsWith('data:')) continue;
+      const data = trimmed.slice(5).trim();
+      if (data === '[DONE]') return content;
+      try {
+        const delta = JSON.parse(data).choices?.[0]?.delta?.content;
+        if (delta) {
+          content += delta;
+          onToken(content);
+        }
+      } catch (parseError) {
+        console.warn('Skipping malformed stream event:', data);
+      }
+    }
+  }
+
+  return content;
+}
+
 export async function generateChatResponse(
   messages: ChatMessage[],
-  query: string
+  query: string,
+  onToken?: (content: string) => void
 ): Promise<string> {
   try {
-    // Search for relevant documents in Weaviate
-    const relevantDocuments = await searchWeaviateDocuments(query);
-
-    // Generate system prompt based on relevant documents
-    const systemPrompt = generateSystemPrompt(relevantDocuments);
-
-    // Add system prompt to messages
-    const allMessages = [
-      { role: 'system', content: systemPrompt } as ChatMessage,
-      ...messages
-    ];
-
     // Check if backend URL is valid
     if (!BACKEND_URL) {
       console.warn('Backend URL is not set. Using mock response.');
-      return generateMockResponse(query, relevantDocuments);
+      return generateMockResponse(query, getMockDocuments(query));
     }
 
     try {
-      // Call the backend chat endpoint
-      const chatUrl = `${BACKEND_URL}/chat`;
-      console.log('Chat URL:', chatUrl);
+      // The backend retrieves documents, builds the prompt and calls DeepSeek in one request
+      const ragUrl = `${BACKEND_URL}/rag`;
+      console.log('RAG URL:', ragUrl);
 
-      const response = await fetch(chatUrl, {
+      const response = await fetch(ragUrl, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'Accept': 'application/json',
+          'Accept': onToken ? 'text/event-stream' : 'application/json',
         },
         body: JSON.stringify({
           model: MODEL,
-          messages: allMessages,
+          messages,
+          query,
           temperature: 0.7,
           max_tokens: 1000,
+          stream: Boolean(onToken),
         }),
         mode: 'cors',
       });
 
-      console.log('Chat response status:', response.status);
+      console.log('RAG response status:', response.status);
 
       if (!response.ok) {
-        console.warn(`Chat request failed with status ${response.status}. Using mock response.`);
+        console.warn(`RAG request failed with status ${response.status}. Using mock response.`);
         const errorText = await response.text();
         console.error('Error response:', errorText);
-        return generateMockResponse(query, relevantDocuments);
+        return generateMockResponse(query, getMockDocuments(query));
       }
 
-      const data = await response.json();
-      console.log('Chat response data:', data);
+      // Render tokens as they arrive when the caller asked for streaming
+      if (onToken && response.body) {
+        const streamed = await readChatStream(response.body, onToken);
+        return streamed || 'No response generated.';
+      }
+
+      const data: RagResponse = await response.json();
+      console.log('RAG response data:', data);
 
       // Return the generated text
-      return data.choices[0]?.message?.content || 'No response generated.';
+      return data.answer || 'No response generated.';
     } catch (apiError) {
-      console.warn('Error calling chat API:', apiError);
-      return generateMockResponse(query, relevantDocuments);
+      console.warn('Error calling RAG API:', apiError);
+      return generateMockResponse(query, getMockDocuments(query));
     }
   } catch (error) {
     console.error('Error generating chat response:', error);
@@ -168,20 +226,3 @@ function generateMockResponse(query: string, documents: WeaviateDocument[]): str
 
   return `Based on the documents you've uploaded, here's what I found about "${query}":\n\n${documentMentions}\n\n---\n\n**Note: This is a simulated response**\n\nThe DeepSeek API is not properly configured. To get real AI-generated responses:\n\n1. Obtain a DeepSeek API key from https://platform.deepseek.com\n2. Go to your Cloudflare Pages dashboard\n3. Navigate to Settings > Environment variables\n4. Add the following environment variables:\n   - VITE_DEEPSEEK_API_KEY: Your DeepSeek API key\n   - VITE_DEEPSEEK_API_BASE: https://api.deepseek.com/v1\n   - VITE_DEEPSEEK_MODEL: deepseek-chat\n5. Redeploy your application`;
 }
-
-// Function to generate a system prompt based on relevant documents from Weaviate
-export function generateSystemPrompt(documents: WeaviateDocument[]): string {
-  if (documents.length === 0) {
-    return `You are an AI assistant that helps users find information in their documents. However, I couldn't find any relevant documents for this query. Please let the user know and offer general assistance.`;
-  }
-
-  const documentContents = documents.map(doc => `Document: ${doc.filename}\n${doc.content}`);
-
-  return `You are an AI assistant that helps users find information in their documents.
-  Use the following relevant document contents to answer the user's questions:
-
-  ${documentContents.join('\n\n')}
-
-  If the answer is not in the documents, say so clearly. Do not make up information.
-  Always cite the document filename when providing information from a specific document.`;
-}